@@ -15,4 +15,8 @@ bootstrap = Bootstrap(app)
 login = LoginManager(app)
 login.login_view = 'login' # This tells Flask-Login which view function handles logins
 
-from app import routes, models
\ No newline at end of file
+from app import routes, models, commands
+
+if app.config['INSTRUMENTATION_ENABLED']:
+    from app import instrumentation
+    instrumentation.init_app(app, db)
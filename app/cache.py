@@ -0,0 +1,88 @@
+import threading
+import time
+from collections import OrderedDict, namedtuple
+from app import db
+from app.models import Laptop
+
+# What the ingest and status paths need to know about a laptop
+LaptopRecord = namedtuple('LaptopRecord', [
+    'id', 'serial_number', 'user_id', 'ibeacon_uuid', 'ibeacon_major', 'ibeacon_minor', 'ibeacon_tx_power'
+])
+
+
+class LRUCache:
+    """Thread-safe mapping with a size limit (least recently used entries go first) and a TTL per entry."""
+
+    def __init__(self, maxsize=4096, ttl=60):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            value, expires_at = entry
+            if expires_at <= time.monotonic():
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return value
+
+    def set(self, key, value):
+        with self._lock:
+            self._entries[key] = (value, time.monotonic() + self.ttl)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+
+    def invalidate(self, key):
+        with self._lock:
+            self._entries.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+
+class LaptopCache:
+    """
+    Resolves serial numbers to LaptopRecords without loading Laptop objects.
+
+    Records are kept in an LRU cache and must be invalidated when a laptop is
+    added or deleted; the TTL works as in StatusCache (app/status.py).
+    """
+
+    def __init__(self, maxsize=4096, ttl=60):
+        self._cache = LRUCache(maxsize, ttl)
+
+    def resolve(self, serial_numbers):
+        """Returns {serial_number: LaptopRecord} for the known laptops, loading misses with one query."""
+        records = {}
+        missing = []
+        for serial_number in serial_numbers:
+            record = self._cache.get(serial_number)
+            if record is None:
+                missing.append(serial_number)
+            else:
+                records[serial_number] = record
+        if missing:
+            rows = db.session.query(*(getattr(Laptop, field) for field in LaptopRecord._fields)).filter(
+                Laptop.serial_number.in_(missing)
+            ).all()
+            for row in rows:
+                record = LaptopRecord(*row)
+                self._cache.set(record.serial_number, record)
+                records[record.serial_number] = record
+        return records
+
+    def invalidate(self, serial_number):
+        self._cache.invalidate(serial_number)
+
+    def clear(self):
+        self._cache.clear()
+
+
+laptop_cache = LaptopCache()
@@ -0,0 +1,127 @@
+from datetime import datetime
+import os
+import time
+import click
+from flask.cli import AppGroup
+from app import app, db
+from app.models import Gateway, Laptop
+from app.gateways import assign_laptop
+from app.retention import DEFAULT_PARTITION, is_partitioned, create_partitions, prune_readings
+from app.rollups import MINUTE, HOUR, update_rollups
+from app.export import DEFAULT_CHUNK_SIZE, EXPORTERS, iter_chunks
+
+readings_cli = AppGroup('readings', help='Sensor reading storage maintenance.')
+gateways_cli = AppGroup('gateways', help='Gateway and laptop assignment management.')
+
+
+@readings_cli.command('partition')
+@click.option('--ahead', default=7, show_default=True, help='Number of days to create partitions for.')
+def create_reading_partitions(ahead):
+    """Create upcoming daily sensor_reading partitions (PostgreSQL only)."""
+    if not is_partitioned():
+        click.echo('sensor_reading is not partitioned, nothing to do.')
+        return
+    created, failed = create_partitions(datetime.utcnow().date(), ahead)
+    click.echo(f"Created {len(created)} partition(s): {', '.join(created) or '-'}")
+    if failed:
+        for name, error in failed:
+            click.echo(f"Could not create {name}: {error}", err=True)
+        raise click.ClickException(f"{len(failed)} partition(s) could not be created; their readings go to {DEFAULT_PARTITION}.")
+
+
+@readings_cli.command('prune')
+@click.option('--days', type=int, default=None, help='Retention in days (defaults to SENSOR_READING_RETENTION_DAYS).')
+def prune_reading_history(days):
+    """Drop sensor readings older than the retention period."""
+    if days is None:
+        days = app.config['SENSOR_READING_RETENTION_DAYS']
+    dropped, deleted = prune_readings(days)
+    click.echo(f"Dropped {len(dropped)} partition(s), deleted {deleted} row(s) older than {days} days.")
+
+
+@readings_cli.command('rollup')
+@click.option('--since', type=click.DateTime(), default=None, help='Recompute buckets from this time (UTC) instead of resuming.')
+def rollup_readings(since):
+    """Update the 1-minute and 1-hour sensor reading rollups."""
+    processed = update_rollups(since=since)
+    click.echo(f"Processed {processed[MINUTE]} minute and {processed[HOUR]} hour bucket(s).")
+
+
+@readings_cli.command('export')
+@click.argument('path', type=click.Path(dir_okay=False, writable=True))
+@click.option('--format', 'file_format', type=click.Choice(sorted(EXPORTERS)), default=None,
+              help='Output format (defaults to the file extension).')
+@click.option('--start', type=click.DateTime(), default=None, help='Export readings from this time (UTC).')
+@click.option('--end', type=click.DateTime(), default=None, help='Export readings before this time (UTC).')
+@click.option('--laptop-id', type=int, default=None, help='Only export readings of this laptop.')
+@click.option('--chunk-size', type=int, default=DEFAULT_CHUNK_SIZE, show_default=True, help='Rows fetched per chunk.')
+def export_readings(path, file_format, start, end, laptop_id, chunk_size):
+    """Export sensor readings to a columnar Parquet or NumPy .npz file."""
+    file_format = file_format or os.path.splitext(path)[1].lstrip('.').lower()
+    if file_format not in EXPORTERS:
+        raise click.UsageError('Use a .parquet or .npz file name, or pass --format.')
+
+    started = time.monotonic()
+    try:
+        rows = EXPORTERS[file_format](path, iter_chunks(start, end, laptop_id, chunk_size))
+    except RuntimeError as e:
+        raise click.ClickException(str(e))
+    elapsed = time.monotonic() - started
+    click.echo(f"Exported {rows} reading(s) to {path} in {elapsed:.1f}s.")
+
+
+def _get_gateway(name):
+    gateway = Gateway.query.filter_by(name=name).first()
+    if gateway is None:
+        raise click.ClickException(f"Unknown gateway '{name}'.")
+    return gateway
+
+
+@gateways_cli.command('add')
+@click.argument('name')
+def add_gateway(name):
+    """Register a gateway."""
+    if Gateway.query.filter_by(name=name).first() is not None:
+        raise click.ClickException(f"Gateway '{name}' already exists.")
+    db.session.add(Gateway(name=name, assignment_version=1))
+    db.session.commit()
+    click.echo(f"Added gateway '{name}'.")
+
+
+@gateways_cli.command('list')
+def list_gateways():
+    """List gateways with their assignment version and number of laptops."""
+    for gateway in Gateway.query.order_by(Gateway.name):
+        click.echo(f"{gateway.name}\tversion {gateway.assignment_version}\t{gateway.laptops.count()} laptop(s)")
+
+
+@gateways_cli.command('assign')
+@click.argument('name')
+@click.argument('serial_numbers', nargs=-1, required=True)
+def assign_laptops(name, serial_numbers):
+    """Assign laptops to a gateway, moving them from their current one."""
+    gateway = _get_gateway(name)
+    laptops = Laptop.query.filter(Laptop.serial_number.in_(serial_numbers)).all()
+    unknown = set(serial_numbers) - {laptop.serial_number for laptop in laptops}
+    if unknown:
+        raise click.ClickException(f"Unknown laptop(s): {', '.join(sorted(unknown))}")
+    for laptop in laptops:
+        assign_laptop(laptop, gateway)
+    db.session.commit()
+    click.echo(f"Assigned {len(laptops)} laptop(s) to '{name}'.")
+
+
+@gateways_cli.command('remove')
+@click.argument('name')
+def remove_gateway(name):
+    """Delete a gateway. Its laptops are left unassigned."""
+    gateway = _get_gateway(name)
+    for laptop in gateway.laptops:
+        laptop.gateway = None
+    db.session.delete(gateway)
+    db.session.commit()
+    click.echo(f"Removed gateway '{name}'.")
+
+
+app.cli.add_command(readings_cli)
+app.cli.add_command(gateways_cli)
@@ -0,0 +1,116 @@
+import os
+import shutil
+import tempfile
+import zipfile
+from app import db
+from app.models import SensorReading
+
+# Both formats are optional dependencies of the server
+try:
+    import numpy as np
+except ImportError:
+    np = None
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:
+    pa = pq = None
+
+DEFAULT_CHUNK_SIZE = 50000
+
+# (name, column, numpy dtype); NULL RSSI and distances are exported as NaN
+EXPORT_COLUMNS = [
+    ('timestamp', SensorReading.timestamp, 'datetime64[us]'),
+    ('laptop_id', SensorReading.laptop_id, 'int32'),
+    ('rssi', SensorReading.ibeacon_rssi, 'float32'),
+    ('distance_1_cm', SensorReading.ultrasonic_distance_1_cm, 'float32'),
+    ('distance_2_cm', SensorReading.ultrasonic_distance_2_cm, 'float32'),
+    ('distance_3_cm', SensorReading.ultrasonic_distance_3_cm, 'float32'),
+    ('distance_4_cm', SensorReading.ultrasonic_distance_4_cm, 'float32'),
+    ('intrusion', SensorReading.ultrasonic_intrusion_detected, 'bool'),
+]
+
+
+def _arrow_schema():
+    types = {'datetime64[us]': pa.timestamp('us'), 'int32': pa.int32(), 'float32': pa.float32(), 'bool': pa.bool_()}
+    return pa.schema([(name, types[dtype]) for name, _, dtype in EXPORT_COLUMNS])
+
+
+def iter_chunks(start=None, end=None, laptop_id=None, chunk_size=DEFAULT_CHUNK_SIZE):
+    """
+    Yields the export columns of the selected readings as one list per
+    column, chunk_size rows at a time. Rows are fetched through a server-side
+    cursor where the driver supports one, so memory use doesn't grow with the
+    size of the export.
+    """
+    query = db.select(*(column for _, column, _ in EXPORT_COLUMNS)).order_by(SensorReading.timestamp)
+    if start is not None:
+        query = query.where(SensorReading.timestamp >= start)
+    if end is not None:
+        query = query.where(SensorReading.timestamp < end)
+    if laptop_id is not None:
+        query = query.where(SensorReading.laptop_id == laptop_id)
+
+    result = db.session.execute(query, execution_options={'stream_results': True, 'yield_per': chunk_size})
+    try:
+        for rows in result.partitions():
+            yield [list(values) for values in zip(*rows)]
+    finally:
+        result.close()
+
+
+def _numpy_column(values, dtype):
+    if dtype == 'float32':
+        return np.fromiter((np.nan if value is None else value for value in values), dtype=np.float32, count=len(values))
+    if dtype == 'bool':
+        return np.fromiter((bool(value) for value in values), dtype=bool, count=len(values))
+    return np.array(values, dtype=dtype)
+
+
+def export_parquet(path, chunks):
+    """Writes the chunks to a Parquet file, one row group per chunk. Returns the number of rows."""
+    if pa is None:
+        raise RuntimeError('Parquet export requires pyarrow (pip install pyarrow).')
+    schema = _arrow_schema()
+    rows = 0
+    with pq.ParquetWriter(path, schema, compression='zstd') as writer:
+        for columns in chunks:
+            arrays = [pa.array(values, type=field.type) for values, field in zip(columns, schema)]
+            writer.write_table(pa.Table.from_arrays(arrays, schema=schema))
+            rows += len(columns[0])
+    return rows
+
+
+def export_npz(path, chunks):
+    """
+    Writes the chunks to a NumPy .npz archive with one array per column.
+    Returns the number of rows.
+
+    Each column is appended to a temporary file as raw values, and the
+    .npy entries are assembled at the end, so only one chunk is ever held in
+    memory. The archive loads with numpy.load().
+    """
+    if np is None:
+        raise RuntimeError('NPZ export requires numpy (pip install numpy).')
+    rows = 0
+    with tempfile.TemporaryDirectory(dir=os.path.dirname(os.path.abspath(path))) as directory:
+        parts = {name: open(os.path.join(directory, name), 'wb') for name, _, _ in EXPORT_COLUMNS}
+        try:
+            for columns in chunks:
+                for (name, _, dtype), values in zip(EXPORT_COLUMNS, columns):
+                    parts[name].write(_numpy_column(values, dtype).tobytes())
+                rows += len(columns[0])
+        finally:
+            for part in parts.values():
+                part.close()
+
+        with zipfile.ZipFile(path, 'w', compression=zipfile.ZIP_STORED, allowZip64=True) as archive:
+            for name, _, dtype in EXPORT_COLUMNS:
+                header = {'descr': np.lib.format.dtype_to_descr(np.dtype(dtype)), 'fortran_order': False, 'shape': (rows,)}
+                with archive.open(f'{name}.npy', 'w', force_zip64=True) as entry, open(parts[name].name, 'rb') as part:
+                    np.lib.format.write_array_header_1_0(entry, header)
+                    shutil.copyfileobj(part, entry, 1024 * 1024)
+    return rows
+
+
+EXPORTERS = {'parquet': export_parquet, 'npz': export_npz}
@@ -1,6 +1,6 @@
 from flask_wtf import FlaskForm
-from wtforms import StringField, PasswordField, BooleanField, SubmitField, IntegerField
-from wtforms.validators import DataRequired, ValidationError, Email, EqualTo, Length
+from wtforms import StringField, PasswordField, BooleanField, SubmitField, IntegerField, FloatField, SelectField
+from wtforms.validators import DataRequired, ValidationError, Email, EqualTo, Length, Optional, NumberRange
 from app.models import User, Laptop
 
 class LoginForm(FlaskForm):
@@ -35,6 +35,16 @@ class LaptopForm(FlaskForm):
     ibeacon_uuid = StringField('iBeacon UUID', validators=[DataRequired()])
     ibeacon_major = IntegerField('iBeacon Major', validators=[DataRequired()])
     ibeacon_minor = IntegerField('iBeacon Minor', validators=[DataRequired()])
+    ibeacon_tx_power = IntegerField('Measured Power at 1 m (dBm)', validators=[Optional(), NumberRange(min=-127, max=0)])
+
+    # Alarm thresholds; empty fields use the site-wide defaults
+    ultrasonic_sensor = IntegerField('Ultrasonic Sensor (1-4)', validators=[Optional(), NumberRange(min=1, max=4)])
+    rssi_threshold = IntegerField('Minimum RSSI (dBm)', validators=[Optional(), NumberRange(min=-127, max=0)])
+    min_distance_cm = FloatField('Minimum Distance (cm)', validators=[Optional(), NumberRange(min=0)])
+    max_distance_cm = FloatField('Maximum Distance (cm)', validators=[Optional(), NumberRange(min=0)])
+
+    # Choices are filled in by the view; 0 means no gateway
+    gateway = SelectField('Gateway', coerce=int, default=0)
     
     submit = SubmitField('Add Laptop')
 
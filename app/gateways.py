@@ -0,0 +1,54 @@
+from flask import current_app
+from app import db
+from app.models import Gateway, Laptop
+
+
+def bump_assignment_version(gateway_id):
+    """Marks a gateway's assignment as changed. Call it in the transaction that changes the assignment."""
+    if gateway_id is None:
+        return
+    db.session.execute(
+        db.update(Gateway).where(Gateway.id == gateway_id).values(
+            assignment_version=Gateway.assignment_version + 1
+        ),
+        execution_options={'synchronize_session': False}
+    )
+
+
+def assign_laptop(laptop, gateway):
+    """Moves a laptop to another gateway (or to none) and bumps both assignment versions."""
+    previous_gateway_id = laptop.gateway_id
+    laptop.gateway = gateway
+    bump_assignment_version(previous_gateway_id)
+    if gateway is not None and gateway.id != previous_gateway_id:
+        bump_assignment_version(gateway.id)
+
+
+def gateway_assignment(gateway):
+    """
+    The laptops a gateway monitors, with their beacons, ultrasonic sensors
+    and alarm thresholds. Thresholds the laptop doesn't override are filled
+    in with the site-wide defaults, the same way the server's rule engine
+    does.
+    """
+    config = current_app.config
+    rows = db.session.query(
+        Laptop.serial_number, Laptop.ibeacon_mac_address, Laptop.ibeacon_tx_power,
+        Laptop.ultrasonic_sensor_index, Laptop.min_distance_cm, Laptop.max_distance_cm
+    ).filter(Laptop.gateway_id == gateway.id).order_by(Laptop.id).all()
+
+    def default(value, key):
+        return value if value is not None else config[key]
+
+    return {
+        'gateway': gateway.name,
+        'version': gateway.assignment_version,
+        'laptops': [{
+            'serial_number': row.serial_number,
+            'ibeacon_mac_address': row.ibeacon_mac_address,
+            'ibeacon_tx_power': row.ibeacon_tx_power,
+            'ultrasonic_sensor_index': row.ultrasonic_sensor_index,
+            'min_distance_cm': default(row.min_distance_cm, 'SECURITY_MIN_DISTANCE_CM'),
+            'max_distance_cm': default(row.max_distance_cm, 'SECURITY_MAX_DISTANCE_CM'),
+        } for row in rows],
+    }
@@ -1,47 +1,50 @@
 import asyncio
+import threading
 import time
 from bleak import BleakScanner
+from sensing.ibeacon import parse_ibeacon
 
-async def scan_for_ibeacons(scan_duration=10):
+# Beacons that haven't advertised for this many seconds are dropped from the cache
+DEFAULT_CACHE_TTL = 30
+
+
+class ScannerUnavailable(RuntimeError):
+    """The Bluetooth scanner failed to start, or didn't start in time."""
+
+
+async def scan_for_ibeacons(scan_duration=10, on_beacon=None, uuids=None):
     """
     Scans for iBeacons using the bleak library for a specified duration,
-    returning the MAC address and RSSI.
+    returning the MAC address and RSSI. If given, on_beacon is called with
+    each beacon as soon as it is first seen, and only beacons with one of
+    the uuids (see sensing.ibeacon.uuid_whitelist) are reported.
     """
     found_beacons = {}
     
     def detection_callback(device, advertisement_data):
-        # iBeacon data is typically found in the manufacturer_data field
-        # Apple's manufacturer ID is 0x004c
-        apple_id = 0x004c
-        if apple_id in advertisement_data.manufacturer_data:
-            data = advertisement_data.manufacturer_data[apple_id]
-            # iBeacon data starts with bytes [0x02, 0x15]
-            if data[0:2] == bytes([0x02, 0x15]):
-                # Get the MAC address from the device object
-                mac_address = device.address
-                
-                # Get other beacon data
-                uuid = data[2:18].hex()
-                major = int.from_bytes(data[18:20], byteorder='big')
-                minor = int.from_bytes(data[20:22], byteorder='big')
-                rssi = advertisement_data.rssi
-
-                # Use the MAC address as the unique key
-                if mac_address not in found_beacons:
-                    found_beacons[mac_address] = {
-                        'mac_address': mac_address,
-                        'uuid': uuid,
-                        'major': major,
-                        'minor': minor,
-                        'rssi': rssi
-                    }
+        ibeacon = parse_ibeacon(advertisement_data, uuids)
+        if ibeacon is not None:
+            # Get the MAC address from the device object
+            mac_address = device.address
+            uuid, major, minor = ibeacon.uuid, ibeacon.major, ibeacon.minor
+            rssi = advertisement_data.rssi
+
+            # Use the MAC address as the unique key
+            if mac_address not in found_beacons:
+                found_beacons[mac_address] = {
+                    'mac_address': mac_address,
+                    'uuid': uuid,
+                    'major': major,
+                    'minor': minor,
+                    'rssi': rssi
+                }
+                if on_beacon is not None:
+                    on_beacon(found_beacons[mac_address])
 
     scanner = BleakScanner(detection_callback)
     
     print("Scanning for iBeacons...")
     
-    start_time = time.time()
-    
     await scanner.start()
     
     await asyncio.sleep(scan_duration)
@@ -50,6 +53,144 @@ async def scan_for_ibeacons(scan_duration=10):
     
     return list(found_beacons.values())
 
+
+class BeaconCache:
+    """
+    Recently seen iBeacons keyed by MAC address. Entries expire once their
+    beacon hasn't advertised for ttl seconds.
+    """
+
+    def __init__(self, ttl=DEFAULT_CACHE_TTL):
+        self.ttl = ttl
+        self._entries = {}
+        self._lock = threading.Lock()
+
+    def update(self, mac_address, uuid, major, minor, rssi, now=None):
+        """Records an advertisement. Returns the entry if the beacon is new to the cache, else None."""
+        now = now or time.time()
+        with self._lock:
+            entry = self._entries.get(mac_address)
+            if entry is not None and now - entry['last_seen'] <= self.ttl:
+                entry.update(uuid=uuid, major=major, minor=minor, rssi=rssi, last_seen=now)
+                entry['hits'] += 1
+                return None
+            entry = {
+                'mac_address': mac_address,
+                'uuid': uuid,
+                'major': major,
+                'minor': minor,
+                'rssi': rssi,
+                'first_seen': now,
+                'last_seen': now,
+                'hits': 1
+            }
+            self._entries[mac_address] = entry
+            return dict(entry)
+
+    def snapshot(self, now=None):
+        """Evicts expired entries and returns copies of the remaining ones."""
+        now = now or time.time()
+        with self._lock:
+            expired = [mac for mac, entry in self._entries.items() if now - entry['last_seen'] > self.ttl]
+            for mac in expired:
+                del self._entries[mac]
+            return [dict(entry) for entry in self._entries.values()]
+
+
+class IBeaconScannerService:
+    """
+    A long-lived BleakScanner running on a background event loop. Every
+    advertisement updates a shared BeaconCache, so scan requests can be
+    answered from the cache instead of starting a new scan each time.
+    If uuids is given, advertisements of other iBeacons are ignored.
+    """
+
+    def __init__(self, cache_ttl=DEFAULT_CACHE_TTL, uuids=None):
+        self.cache = BeaconCache(ttl=cache_ttl)
+        self.uuids = uuids
+        self.started_at = None
+        self.error = None
+        self._listeners = set()
+        self._listeners_lock = threading.Lock()
+        self._lock = threading.Lock()
+        self._ready = threading.Event()
+        self._run_future = None
+        self._loop = None
+        self._stop = None
+
+    @property
+    def running(self):
+        return self.started_at is not None
+
+    def start(self, timeout=10):
+        """
+        Starts the scanner unless it is already running and returns the time
+        it started. Raises ScannerUnavailable if it fails to start or isn't
+        up within timeout seconds; a later call keeps waiting for a start
+        that is still in progress.
+        """
+        with self._lock:
+            if self.running:
+                return self.started_at
+            if self._loop is None:
+                self._loop = asyncio.new_event_loop()
+                threading.Thread(target=self._loop.run_forever, name='ibeacon-scanner', daemon=True).start()
+            if self._run_future is None or self._run_future.done():
+                self._ready.clear()
+                self.error = None
+                self._run_future = asyncio.run_coroutine_threadsafe(self._run(), self._loop)
+            if not self._ready.wait(timeout):
+                raise ScannerUnavailable(f'The Bluetooth scanner did not start within {timeout} seconds')
+            if self.error:
+                raise ScannerUnavailable(self.error)
+            return self.started_at
+
+    def stop(self):
+        if self._loop is not None and self._stop is not None:
+            self._loop.call_soon_threadsafe(self._stop.set)
+
+    def add_listener(self, listener):
+        """Calls listener(beacon) from the scanner thread whenever a beacon enters the cache."""
+        with self._listeners_lock:
+            self._listeners.add(listener)
+
+    def remove_listener(self, listener):
+        with self._listeners_lock:
+            self._listeners.discard(listener)
+
+    def beacons(self):
+        return self.cache.snapshot()
+
+    def _detection_callback(self, device, advertisement_data):
+        ibeacon = parse_ibeacon(advertisement_data, self.uuids)
+        if ibeacon is None:
+            return
+        beacon = self.cache.update(device.address, ibeacon.uuid, ibeacon.major, ibeacon.minor, advertisement_data.rssi)
+        if beacon is not None:
+            with self._listeners_lock:
+                listeners = list(self._listeners)
+            for listener in listeners:
+                listener(beacon)
+
+    async def _run(self):
+        scanner = BleakScanner(self._detection_callback)
+        try:
+            await scanner.start()
+        except Exception as e:
+            self.error = str(e)
+            self._ready.set()
+            return
+
+        self._stop = asyncio.Event()
+        self.started_at = time.time()
+        self._ready.set()
+        try:
+            await self._stop.wait()
+        finally:
+            self.started_at = None
+            await scanner.stop()
+
+
 if __name__ == '__main__':
     async def main():
         beacons = await scan_for_ibeacons()
@@ -60,4 +201,4 @@ if __name__ == '__main__':
         else:
             print("No iBeacons found.")
 
-    asyncio.run(main())
\ No newline at end of file
+    asyncio.run(main())
@@ -0,0 +1,345 @@
+import csv
+import io
+import math
+from flask import current_app
+from app import db
+from app.models import Laptop, SensorReading
+from app.status_stream import status_broker
+from app.rules import rule_engine
+from app.status import status_cache
+from app.cache import laptop_cache
+from app.timestamps import parse_timestamp
+from sensing.rssi import MAX_RSSI, MIN_RSSI, RssiFilter, estimate_distance
+
+REQUIRED_FIELDS = ('serial_number', 'ibeacon_rssi', 'ultrasonic_distances')
+MAX_BATCH_SIZE = 1000
+# Batches of at least this many readings are written with COPY on PostgreSQL
+COPY_MIN_ROWS = 200
+
+# RSSI filter state per laptop id for readings that arrive without a filtered
+# value. Like the live status state, it is kept in process.
+_rssi_filters = {}
+
+
+def _is_number(value):
+    return not isinstance(value, bool) and isinstance(value, (int, float)) and math.isfinite(value)
+
+
+def _optional_number(item, field):
+    value = item.get(field)
+    if value is None:
+        return None
+    if not _is_number(value):
+        raise ValueError(f'{field} must be a number')
+    return value
+
+
+def _check_rssi(value, field):
+    if value is not None and not MIN_RSSI <= value <= MAX_RSSI:
+        raise ValueError(f'{field} must be between {MIN_RSSI} and {MAX_RSSI} dBm')
+    return value
+
+
+def _reading_from_item(item, laptop):
+    """
+    Validates a single reading and builds the column mapping for the bulk insert.
+    Raises ValueError with a client-facing message if the item is malformed.
+    """
+    distances = item['ultrasonic_distances']
+    if not isinstance(distances, (list, tuple)) or len(distances) != 4:
+        raise ValueError('ultrasonic_distances must contain 4 values')
+    if not all(distance is None or _is_number(distance) for distance in distances):
+        raise ValueError('ultrasonic_distances must be numbers')
+
+    try:
+        timestamp = parse_timestamp(item.get('timestamp'))
+    except (TypeError, ValueError, OverflowError, OSError):
+        raise ValueError('Invalid timestamp')
+
+    rssi = item['ibeacon_rssi']
+    if not _is_number(rssi) or not float(rssi).is_integer():
+        raise ValueError('ibeacon_rssi must be an integer')
+    # The column is an integer; COPY rejects -70.0 as well as -70.5
+    rssi = _check_rssi(int(rssi), 'ibeacon_rssi')
+
+    return {
+        'timestamp': timestamp,
+        'ibeacon_rssi': rssi,
+        'ibeacon_rssi_filtered': _check_rssi(_optional_number(item, 'ibeacon_rssi_filtered'), 'ibeacon_rssi_filtered'),
+        'estimated_distance_m': _optional_number(item, 'estimated_distance_m'),
+        'ultrasonic_distance_1_cm': distances[0],
+        'ultrasonic_distance_2_cm': distances[1],
+        'ultrasonic_distance_3_cm': distances[2],
+        'ultrasonic_distance_4_cm': distances[3],
+        'ultrasonic_intrusion_detected': False,
+        'laptop_id': laptop.id,
+    }
+
+
+def ingest_readings(items):
+    """
+    Stores a batch of sensor readings coming from one or more gateways.
+
+    Serial numbers are resolved through the laptop cache and every valid reading
+    is written with one bulk insert (see _insert_readings) and one commit. Returns a list with one
+    result dict per item, in the same order as the input.
+    """
+    results = []
+    serials = {
+        item['serial_number'] for item in items
+        if isinstance(item, dict) and isinstance(item.get('serial_number'), str)
+    }
+
+    laptops = laptop_cache.resolve(serials)
+
+    mappings = []
+    for index, item in enumerate(items):
+        if not isinstance(item, dict) or not all(field in item for field in REQUIRED_FIELDS):
+            results.append({'index': index, 'status': 'error', 'error': 'Missing required fields'})
+            continue
+
+        serial_number = item['serial_number']
+        if not isinstance(serial_number, str):
+            results.append({'index': index, 'status': 'error', 'error': 'serial_number must be a string'})
+            continue
+        result = {'index': index, 'serial_number': serial_number}
+        laptop = laptops.get(serial_number)
+        if laptop is None:
+            result.update(status='error', error='Laptop not found')
+        else:
+            try:
+                mappings.append(_reading_from_item(item, laptop))
+                result['status'] = 'ok'
+            except ValueError as e:
+                result.update(status='error', error=str(e))
+        results.append(result)
+
+    if mappings:
+        _smooth_rssi(mappings, laptops)
+        verdicts = rule_engine.evaluate(mappings)
+        reading_ids = _insert_readings(mappings)
+        changes = _apply_verdicts(verdicts)
+        if reading_ids is not None:
+            _advance_latest_reading(mappings, reading_ids)
+        else:
+            refresh_latest_reading({mapping['laptop_id'] for mapping in mappings})
+        db.session.commit()
+        _publish_latest(mappings, laptops, changes)
+
+    return results
+
+
+def _insert_readings(mappings):
+    """
+    Writes reading rows without going through the ORM and returns their ids
+    in the order of mappings, or None where the database can't return them
+    from a bulk insert. Large batches on PostgreSQL are streamed with COPY;
+    everything else is a single Core executemany, which the drivers send as
+    multi-row INSERTs.
+    """
+    if len(mappings) >= COPY_MIN_ROWS and db.engine.dialect.name == 'postgresql' and db.engine.driver == 'psycopg2':
+        return _copy_readings(mappings)
+    table = SensorReading.__table__
+    if db.engine.dialect.insert_executemany_returning_sort_by_parameter_order:
+        return db.session.execute(
+            table.insert().returning(table.c.id, sort_by_parameter_order=True), mappings
+        ).scalars().all()
+    db.session.execute(table.insert(), mappings)
+    return None
+
+
+def _copy_readings(mappings):
+    # COPY can't return the new ids, so they are taken from the sequence first
+    reading_ids = sorted(db.session.execute(
+        db.text("SELECT nextval(pg_get_serial_sequence(:table, 'id')) FROM generate_series(1, :count)"),
+        {'table': SensorReading.__tablename__, 'count': len(mappings)}
+    ).scalars().all())
+    columns = list(mappings[0])
+    buffer = io.StringIO()
+    writer = csv.writer(buffer, lineterminator='\n')
+    # Unquoted empty fields are NULL in COPY's CSV format
+    writer.writerows(
+        [reading_id] + [mapping[column] for column in columns] for reading_id, mapping in zip(reading_ids, mappings)
+    )
+    buffer.seek(0)
+    # The raw connection shares the session's transaction
+    cursor = db.session.connection().connection.driver_connection.cursor()
+    try:
+        cursor.copy_expert(
+            f"COPY {SensorReading.__tablename__} (id, {', '.join(columns)}) FROM STDIN WITH (FORMAT csv)", buffer
+        )
+    finally:
+        cursor.close()
+    return reading_ids
+
+
+def _smooth_rssi(mappings, laptops):
+    """
+    Fills in the filtered RSSI and the distance estimate of readings that the
+    gateway sent without them. Each laptop's readings are filtered in
+    timestamp order, continuing from the previous batches.
+    """
+    if not current_app.config['RSSI_FILTER_ON_INGEST']:
+        return
+
+    tx_powers = {laptop.id: laptop.ibeacon_tx_power for laptop in laptops.values()}
+    path_loss_exponent = current_app.config['RSSI_PATH_LOSS_EXPONENT']
+    for mapping in sorted(mappings, key=lambda mapping: mapping['timestamp']):
+        if mapping['ibeacon_rssi_filtered'] is None:
+            rssi_filter = _rssi_filters.setdefault(mapping['laptop_id'], RssiFilter())
+            timestamp = mapping['timestamp'].timestamp()
+            if rssi_filter.last_timestamp is not None and timestamp < rssi_filter.last_timestamp:
+                # Late reading (e.g. replayed from a gateway's spool); don't
+                # move the filter back in time
+                mapping['ibeacon_rssi_filtered'] = float(mapping['ibeacon_rssi'])
+            else:
+                mapping['ibeacon_rssi_filtered'] = rssi_filter.update(mapping['ibeacon_rssi'], timestamp)
+        if mapping['estimated_distance_m'] is None:
+            mapping['estimated_distance_m'] = estimate_distance(
+                mapping['ibeacon_rssi_filtered'], tx_powers.get(mapping['laptop_id']), path_loss_exponent
+            )
+
+
+def _apply_verdicts(verdicts):
+    """
+    Makes each laptop's is_stolen follow its newest reading: laptops whose
+    rules fired are marked as stolen, laptops whose reading passed every rule
+    are cleared. verdicts maps laptop ids to (is_stolen, timestamp) as
+    returned by the rule engine. Verdicts older than the laptop's latest
+    stored reading or its last status transition (Laptop.stolen_changed_at,
+    which a transition reported by a gateway also sets) are ignored, e.g.
+    readings replayed late from a gateway's spool. Writes at most one UPDATE per
+    direction and returns {laptop_id: is_stolen} for the laptops that changed.
+    """
+    current_state = status_cache.get_many(verdicts)
+    pending = {True: {}, False: {}}
+    for laptop_id, (is_stolen, timestamp) in verdicts.items():
+        current_stolen, observed_at = current_state.get(laptop_id, (None, None))
+        if current_stolen == is_stolen or (observed_at is not None and timestamp < observed_at):
+            continue
+        pending[is_stolen][laptop_id] = timestamp
+
+    changes = {}
+    for is_stolen, timestamps in pending.items():
+        if not timestamps:
+            continue
+        observed_at = db.case(timestamps, value=Laptop.id)
+        if is_stolen:
+            currently = db.or_(Laptop.is_stolen == db.false(), Laptop.is_stolen.is_(None))
+        else:
+            currently = Laptop.is_stolen == db.true()
+        statement = db.update(Laptop).where(
+            Laptop.id.in_(timestamps),
+            currently,
+            db.or_(Laptop.last_seen.is_(None), Laptop.last_seen <= observed_at),
+            db.or_(Laptop.stolen_changed_at.is_(None), Laptop.stolen_changed_at <= observed_at)
+        ).values(is_stolen=is_stolen, stolen_changed_at=observed_at, status_version=Laptop.status_version + 1)
+        if not db.engine.dialect.update_returning:
+            db.session.execute(statement, execution_options={'synchronize_session': False})
+            changed = list(timestamps)
+        else:
+            changed = db.session.execute(
+                statement.returning(Laptop.id), execution_options={'synchronize_session': False}
+            ).scalars().all()
+        for laptop_id in changed:
+            status_cache.set(laptop_id, is_stolen, timestamps[laptop_id])
+            changes[laptop_id] = is_stolen
+    return changes
+
+
+def forget_laptop(laptop_id):
+    """Drops the in-process state kept for a deleted laptop."""
+    _rssi_filters.pop(laptop_id, None)
+    rule_engine.invalidate(laptop_id)
+
+
+def _display_rssi(mapping):
+    if mapping.get('ibeacon_rssi_filtered') is not None:
+        return round(mapping['ibeacon_rssi_filtered'])
+    return mapping['ibeacon_rssi']
+
+
+def _advance_latest_reading(mappings, reading_ids):
+    """
+    Moves Laptop.last_reading_id/last_seen/last_rssi forward to the newest
+    reading of each laptop in a batch that was just inserted, with one
+    executemany UPDATE that doesn't read sensor_reading. Readings older than the
+    laptop's latest one (e.g. replayed late from a gateway's spool) leave
+    the pointer where it is.
+    """
+    newest = {}
+    for mapping, reading_id in zip(mappings, reading_ids):
+        current = newest.get(mapping['laptop_id'])
+        if current is None or mapping['timestamp'] >= current[0]['timestamp']:
+            newest[mapping['laptop_id']] = (mapping, reading_id)
+
+    laptops = Laptop.__table__
+    statement = db.update(laptops).where(
+        laptops.c.id == db.bindparam('laptop_id'),
+        db.or_(laptops.c.last_seen.is_(None), laptops.c.last_seen <= db.bindparam('timestamp'))
+    ).values(
+        last_reading_id=db.bindparam('reading_id'),
+        last_seen=db.bindparam('timestamp'),
+        last_rssi=db.bindparam('rssi'),
+        status_version=laptops.c.status_version + 1
+    )
+    db.session.execute(statement, [
+        {'laptop_id': laptop_id, 'reading_id': reading_id, 'timestamp': mapping['timestamp'], 'rssi': _display_rssi(mapping)}
+        for laptop_id, (mapping, reading_id) in newest.items()
+    ])
+
+
+def refresh_latest_reading(laptop_ids):
+    """
+    Points Laptop.last_reading_id/last_seen/last_rssi at the newest stored
+    reading of each laptop; last_rssi is the filtered RSSI where there is
+    one. Two UPDATE statements cover any number of laptops, but they look
+    up each laptop's newest reading in sensor_reading; ingest uses
+    _advance_latest_reading instead where it knows the new rows' ids.
+    """
+    if not laptop_ids:
+        return
+
+    latest_reading_id = db.select(SensorReading.id).where(
+        SensorReading.laptop_id == Laptop.id
+    ).order_by(
+        db.desc(SensorReading.timestamp), db.desc(SensorReading.id)
+    ).limit(1).scalar_subquery()
+    db.session.execute(
+        db.update(Laptop).where(Laptop.id.in_(laptop_ids)).values(last_reading_id=latest_reading_id),
+        execution_options={'synchronize_session': False}
+    )
+
+    def latest_column(column):
+        return db.select(column).where(SensorReading.id == Laptop.last_reading_id).scalar_subquery()
+
+    db.session.execute(
+        db.update(Laptop).where(Laptop.id.in_(laptop_ids)).values(
+            last_seen=latest_column(SensorReading.timestamp),
+            last_rssi=latest_column(db.func.coalesce(
+                db.cast(db.func.round(SensorReading.ibeacon_rssi_filtered), db.Integer),
+                SensorReading.ibeacon_rssi
+            )),
+            status_version=Laptop.status_version + 1
+        ),
+        execution_options={'synchronize_session': False}
+    )
+
+
+def _publish_latest(mappings, laptops, changes=None):
+    owners = {laptop.id: laptop.user_id for laptop in laptops.values()}
+    latest = {}
+    for mapping in mappings:
+        current = latest.get(mapping['laptop_id'])
+        if current is None or mapping['timestamp'] >= current['timestamp']:
+            latest[mapping['laptop_id']] = mapping
+
+    for laptop_id, mapping in latest.items():
+        status_broker.publish(
+            owners[laptop_id], laptop_id,
+            last_rssi=_display_rssi(mapping),
+            last_seen=mapping['timestamp'].strftime('%Y-%m-%d %H:%M:%S')
+        )
+
+    for laptop_id, is_stolen in (changes or {}).items():
+        status_broker.publish(owners[laptop_id], laptop_id, is_stolen=is_stolen)
@@ -0,0 +1,187 @@
+import threading
+import time
+from bisect import bisect_left
+from flask import g, has_request_context, request, before_render_template, template_rendered
+from sqlalchemy import event
+
+# Upper bounds of the histogram buckets; +Inf is implied
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+COUNT_BUCKETS = (0, 1, 2, 5, 10, 20, 50, 100, 200, 500, 1000)
+ROW_BUCKETS = (0, 1, 10, 100, 1000, 10000, 100000)
+
+
+class Histogram:
+    """A Prometheus histogram with one series per label set."""
+
+    def __init__(self, name, help, label_names, buckets):
+        self.name = name
+        self.help = help
+        self.label_names = label_names
+        self.buckets = buckets
+        self._series = {}
+
+    def observe(self, labels, value):
+        series = self._series.get(labels)
+        if series is None:
+            # [count per bucket..., +Inf count, sum]
+            series = self._series[labels] = [0] * (len(self.buckets) + 1) + [0.0]
+        series[bisect_left(self.buckets, value)] += 1
+        series[-1] += value
+
+    def render(self):
+        lines = [f'# HELP {self.name} {self.help}', f'# TYPE {self.name} histogram']
+        for labels, series in sorted(self._series.items()):
+            label_text = ','.join(f'{name}="{_escape(value)}"' for name, value in zip(self.label_names, labels))
+            separator = ',' if label_text else ''
+            cumulative = 0
+            for bound, count in zip(self.buckets + ('+Inf',), series):
+                cumulative += count
+                lines.append(f'{self.name}_bucket{{{label_text}{separator}le="{bound}"}} {cumulative}')
+            lines.append(f'{self.name}_sum{{{label_text}}} {series[-1]}')
+            lines.append(f'{self.name}_count{{{label_text}}} {cumulative}')
+        return lines
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+class RequestStats:
+    """What one request did so far; lives on flask.g while the request runs."""
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.queries = 0
+        self.query_time = 0.0
+        self.rows = 0
+        # (template name, started, queries so far) of templates being rendered
+        self.templates = []
+
+
+class RequestMetrics:
+    """
+    Per-endpoint request metrics: latency, SQL queries, their time and the
+    rows they returned, and template render times. Collected in process
+    memory, so each server process reports its own requests.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.request_duration = Histogram(
+            'laptop_security_request_duration_seconds', 'Time spent handling a request.',
+            ('endpoint', 'method', 'status'), LATENCY_BUCKETS
+        )
+        self.request_queries = Histogram(
+            'laptop_security_request_queries', 'SQL queries executed by a request.',
+            ('endpoint', 'method'), COUNT_BUCKETS
+        )
+        self.request_query_duration = Histogram(
+            'laptop_security_request_query_duration_seconds', 'Time a request spent executing SQL queries.',
+            ('endpoint', 'method'), LATENCY_BUCKETS
+        )
+        self.request_rows = Histogram(
+            'laptop_security_request_rows', 'Rows returned by the SQL queries of a request.',
+            ('endpoint', 'method'), ROW_BUCKETS
+        )
+        self.template_duration = Histogram(
+            'laptop_security_template_render_duration_seconds', 'Time spent rendering a template.',
+            ('template',), LATENCY_BUCKETS
+        )
+        self.template_queries = Histogram(
+            'laptop_security_template_queries', 'SQL queries executed while rendering a template.',
+            ('template',), COUNT_BUCKETS
+        )
+
+    def record_request(self, endpoint, method, status, duration, stats):
+        with self._lock:
+            self.request_duration.observe((endpoint, method, str(status)), duration)
+            self.request_queries.observe((endpoint, method), stats.queries)
+            self.request_query_duration.observe((endpoint, method), stats.query_time)
+            self.request_rows.observe((endpoint, method), stats.rows)
+
+    def record_template(self, template, duration, queries):
+        with self._lock:
+            self.template_duration.observe((template,), duration)
+            self.template_queries.observe((template,), queries)
+
+    def render(self):
+        """The metrics in the Prometheus text exposition format."""
+        with self._lock:
+            lines = []
+            for histogram in (self.request_duration, self.request_queries, self.request_query_duration,
+                              self.request_rows, self.template_duration, self.template_queries):
+                lines += histogram.render()
+        return '\n'.join(lines) + '\n'
+
+
+request_metrics = RequestMetrics()
+
+
+def _current_stats():
+    if has_request_context():
+        return g.get('request_stats')
+    return None
+
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    if _current_stats() is not None:
+        conn.info.setdefault('query_started', []).append(time.perf_counter())
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    stats = _current_stats()
+    started = conn.info.get('query_started')
+    if stats is None or not started:
+        return
+    stats.queries += 1
+    stats.query_time += time.perf_counter() - started.pop()
+    # psycopg2 knows how many rows a SELECT returned; sqlite3 reports -1
+    if cursor.description is not None and cursor.rowcount > 0:
+        stats.rows += cursor.rowcount
+
+
+def _before_render_template(sender, template, context, **extra):
+    stats = _current_stats()
+    if stats is not None:
+        stats.templates.append((template.name, time.perf_counter(), stats.queries))
+
+
+def _template_rendered(sender, template, context, **extra):
+    stats = _current_stats()
+    if stats is None or not stats.templates:
+        return
+    name, started, queries = stats.templates.pop()
+    request_metrics.record_template(name, time.perf_counter() - started, stats.queries - queries)
+
+
+def init_app(app, db):
+    """
+    Starts collecting request metrics for app. Requests that run more than
+    QUERY_BUDGET queries log a warning.
+    """
+    with app.app_context():
+        event.listen(db.engine, 'before_cursor_execute', _before_cursor_execute)
+        event.listen(db.engine, 'after_cursor_execute', _after_cursor_execute)
+    before_render_template.connect(_before_render_template, app)
+    template_rendered.connect(_template_rendered, app)
+
+    @app.before_request
+    def start_request_stats():
+        g.request_stats = RequestStats()
+
+    @app.after_request
+    def record_request_stats(response):
+        stats = g.pop('request_stats', None)
+        if stats is None:
+            return response
+        endpoint = request.endpoint or 'unmatched'
+        request_metrics.record_request(
+            endpoint, request.method, response.status_code, time.perf_counter() - stats.started, stats
+        )
+        budget = app.config['QUERY_BUDGET']
+        if budget is not None and stats.queries > budget:
+            app.logger.warning(
+                f"{request.method} {request.path} ({endpoint}) ran {stats.queries} queries, "
+                f"over the budget of {budget}"
+            )
+        return response
@@ -25,31 +25,65 @@ class User(UserMixin, db.Model):
 def load_user(id):
     return User.query.get(int(id))
 
+class Gateway(db.Model):
+    id = db.Column(db.Integer, primary_key=True)
+    name = db.Column(db.String(64), index=True, unique=True, nullable=False)
+    # Incremented whenever the laptops assigned to the gateway change
+    assignment_version = db.Column(db.Integer, nullable=False, default=1)
+    laptops = db.relationship('Laptop', backref='gateway', lazy='dynamic')
+
+    def __repr__(self):
+        return f'<Gateway {self.name}>'
+
 class Laptop(db.Model):
     id = db.Column(db.Integer, primary_key=True)
     name = db.Column(db.String(120), nullable=False)
     serial_number = db.Column(db.String(120), index=True, unique=True)
     is_stolen = db.Column(db.Boolean, default=False)
+    # Time of the reading or gateway transition that last changed is_stolen
+    stolen_changed_at = db.Column(db.DateTime)
     user_id = db.Column(db.Integer, db.ForeignKey('user.id'))
+    gateway_id = db.Column(db.Integer, db.ForeignKey('gateway.id'), index=True)
     readings = db.relationship('SensorReading', backref='laptop', lazy='dynamic', cascade="all, delete-orphan")
+    rollups = db.relationship('SensorReadingRollup', backref='laptop', lazy='dynamic', cascade="all, delete-orphan")
     
     # ADD THESE COLUMNS
     ibeacon_uuid = db.Column(db.String(36))
     ibeacon_major = db.Column(db.Integer)
     ibeacon_minor = db.Column(db.Integer)
     ibeacon_mac_address = db.Column(db.String(17))
+    # Calibrated RSSI at 1 m, used for distance estimates (None: beacon default)
+    ibeacon_tx_power = db.Column(db.Integer)
+
+    # Security rule overrides; None falls back to the site-wide defaults in Config
+    ultrasonic_sensor_index = db.Column(db.Integer)
+    rssi_threshold = db.Column(db.Integer)
+    min_distance_cm = db.Column(db.Float)
+    max_distance_cm = db.Column(db.Float)
+
+    # Denormalized copy of the latest reading, maintained on ingest so status
+    # lookups don't need to touch sensor_reading
+    last_reading_id = db.Column(db.Integer)
+    last_seen = db.Column(db.DateTime)
+    last_rssi = db.Column(db.Integer)
+    # Incremented whenever is_stolen or the latest-reading columns change
+    status_version = db.Column(db.Integer, nullable=False, default=1)
 
     def __repr__(self):
         return f'<Laptop {self.name} - {self.serial_number}>'
 
 class SensorReading(db.Model):
+    __table_args__ = (
+        db.Index('ix_sensor_reading_laptop_id_timestamp', 'laptop_id', 'timestamp'),
+    )
+
     id = db.Column(db.Integer, primary_key=True)
-    timestamp = db.Column(db.DateTime, index=True, default=datetime.utcnow)
-    ibeacon_uuid = db.Column(db.String(36))
-    ibeacon_major = db.Column(db.Integer)
-    ibeacon_minor = db.Column(db.Integer)
-    ibeacon_mac_address = db.Column(db.String(17))
+    timestamp = db.Column(db.DateTime, index=True, nullable=False, default=datetime.utcnow)
+    # The beacon's identity (uuid/major/minor/MAC) is stored once, on the laptop
     ibeacon_rssi = db.Column(db.Integer)
+    # Smoothed RSSI and the distance to the beacon estimated from it
+    ibeacon_rssi_filtered = db.Column(db.Float)
+    estimated_distance_m = db.Column(db.Float)
     
     # Columns for the four ultrasonic sensors
     ultrasonic_distance_1_cm = db.Column(db.Float)
@@ -63,4 +97,37 @@ class SensorReading(db.Model):
     laptop_id = db.Column(db.Integer, db.ForeignKey('laptop.id'))
 
     def __repr__(self):
-        return f'<SensorReading {self.timestamp} from Laptop {self.laptop_id}>'
\ No newline at end of file
+        return f'<SensorReading {self.timestamp} from Laptop {self.laptop_id}>'
+
+class SensorReadingRollup(db.Model):
+    """Aggregated sensor readings of one laptop over a fixed-size time bucket."""
+    __table_args__ = (
+        db.UniqueConstraint('laptop_id', 'resolution', 'bucket_start', name='uq_sensor_reading_rollup_bucket'),
+    )
+
+    id = db.Column(db.Integer, primary_key=True)
+    laptop_id = db.Column(db.Integer, db.ForeignKey('laptop.id'), nullable=False)
+    resolution = db.Column(db.Integer, nullable=False)  # bucket size in seconds
+    bucket_start = db.Column(db.DateTime, nullable=False)
+    reading_count = db.Column(db.Integer, nullable=False)
+    intrusion_count = db.Column(db.Integer, nullable=False)
+
+    rssi_min = db.Column(db.Integer)
+    rssi_avg = db.Column(db.Float)
+    rssi_max = db.Column(db.Integer)
+
+    distance_1_min_cm = db.Column(db.Float)
+    distance_1_avg_cm = db.Column(db.Float)
+    distance_1_max_cm = db.Column(db.Float)
+    distance_2_min_cm = db.Column(db.Float)
+    distance_2_avg_cm = db.Column(db.Float)
+    distance_2_max_cm = db.Column(db.Float)
+    distance_3_min_cm = db.Column(db.Float)
+    distance_3_avg_cm = db.Column(db.Float)
+    distance_3_max_cm = db.Column(db.Float)
+    distance_4_min_cm = db.Column(db.Float)
+    distance_4_avg_cm = db.Column(db.Float)
+    distance_4_max_cm = db.Column(db.Float)
+
+    def __repr__(self):
+        return f'<SensorReadingRollup {self.resolution}s {self.bucket_start} from Laptop {self.laptop_id}>'
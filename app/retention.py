@@ -0,0 +1,145 @@
+import re
+from datetime import datetime, timedelta
+from sqlalchemy.exc import DBAPIError
+from app import db
+from app.models import Laptop, SensorReading
+
+# On PostgreSQL sensor_reading is range-partitioned by day on timestamp (see
+# migration d81f0c3b6a2e). Expired days are removed by dropping whole
+# partitions; other databases fall back to deleting rows in bounded chunks.
+PARTITION_PREFIX = 'sensor_reading_p'
+DEFAULT_PARTITION = 'sensor_reading_default'
+DELETE_CHUNK_SIZE = 10000
+
+_PARTITION_UPPER_BOUND = re.compile(r"TO \('([^']+)'\)")
+
+
+def partition_name(day):
+    return f'{PARTITION_PREFIX}{day:%Y%m%d}'
+
+
+def is_partitioned():
+    if db.engine.dialect.name != 'postgresql':
+        return False
+    relkind = db.session.execute(db.text(
+        "SELECT c.relkind FROM pg_class c "
+        "WHERE c.oid = to_regclass('sensor_reading')"
+    )).scalar()
+    return relkind == 'p'
+
+
+def create_partitions(start_day, days):
+    """
+    Creates the daily partitions for [start_day, start_day + days) if
+    missing. Rows of a day that already landed in the default partition
+    (e.g. because a run was missed) are moved into the new partition;
+    PostgreSQL refuses to create it otherwise. Each day is committed on its
+    own. Returns (created, failed), failed being (name, error) pairs.
+    """
+    created = []
+    failed = []
+    for offset in range(days):
+        day = start_day + timedelta(days=offset)
+        name = partition_name(day)
+        exists = db.session.execute(db.text("SELECT to_regclass(:name)"), {'name': name}).scalar()
+        if exists:
+            continue
+        try:
+            _create_partition(name, day)
+            db.session.commit()
+        except DBAPIError as e:
+            db.session.rollback()
+            failed.append((name, str(e.orig).strip()))
+        else:
+            created.append(name)
+    return created, failed
+
+
+def _create_partition(name, day):
+    bounds = {'start': day, 'end': day + timedelta(days=1)}
+    range_sql = f"FROM ('{day:%Y-%m-%d}') TO ('{bounds['end']:%Y-%m-%d}')"
+    stray = db.session.execute(db.text(
+        f"SELECT EXISTS (SELECT 1 FROM {DEFAULT_PARTITION} WHERE timestamp >= :start AND timestamp < :end)"
+    ), bounds).scalar()
+    if not stray:
+        db.session.execute(db.text(f"CREATE TABLE {name} PARTITION OF sensor_reading FOR VALUES {range_sql}"))
+        return
+    # Build the partition next to the table, move the day's rows over and
+    # attach it; all in one transaction
+    db.session.execute(db.text(f"CREATE TABLE {name} (LIKE sensor_reading INCLUDING DEFAULTS INCLUDING CONSTRAINTS)"))
+    db.session.execute(db.text(
+        f"WITH moved AS (DELETE FROM {DEFAULT_PARTITION} WHERE timestamp >= :start AND timestamp < :end RETURNING *) "
+        f"INSERT INTO {name} SELECT * FROM moved"
+    ), bounds)
+    db.session.execute(db.text(f"ALTER TABLE sensor_reading ATTACH PARTITION {name} FOR VALUES {range_sql}"))
+
+
+def _partitions():
+    rows = db.session.execute(db.text(
+        "SELECT c.relname, pg_get_expr(c.relpartbound, c.oid) "
+        "FROM pg_inherits i JOIN pg_class c ON c.oid = i.inhrelid "
+        "WHERE i.inhparent = 'sensor_reading'::regclass"
+    )).all()
+    return [(name, bound) for name, bound in rows]
+
+
+def drop_expired_partitions(cutoff):
+    """
+    Detaches and drops every partition whose upper bound is at or before
+    cutoff. Returns the names of the dropped partitions.
+    """
+    dropped = []
+    for name, bound in _partitions():
+        match = _PARTITION_UPPER_BOUND.search(bound or '')
+        if match is None:
+            continue
+        upper_bound = datetime.fromisoformat(match.group(1))
+        if upper_bound <= cutoff:
+            db.session.execute(db.text(f"ALTER TABLE sensor_reading DETACH PARTITION {name}"))
+            db.session.execute(db.text(f"DROP TABLE {name}"))
+            dropped.append(name)
+    db.session.commit()
+    return dropped
+
+
+def delete_expired_readings(cutoff, chunk_size=DELETE_CHUNK_SIZE):
+    """
+    Deletes readings older than cutoff in chunks of chunk_size rows, so no
+    single transaction grows with the size of the table. Returns the number of
+    deleted rows.
+    """
+    expired_ids = db.select(SensorReading.id).where(SensorReading.timestamp < cutoff).limit(chunk_size)
+    deleted = 0
+    while True:
+        result = db.session.execute(
+            db.delete(SensorReading).where(SensorReading.id.in_(expired_ids.scalar_subquery())),
+            execution_options={'synchronize_session': False}
+        )
+        db.session.commit()
+        deleted += result.rowcount
+        if result.rowcount < chunk_size:
+            return deleted
+
+
+def prune_readings(retention_days, now=None):
+    """
+    Applies the retention policy. Returns (dropped_partitions, deleted_rows).
+    On a partitioned table only rows that landed in the default partition are
+    deleted one by one.
+    """
+    cutoff = (now or datetime.utcnow()) - timedelta(days=retention_days)
+    dropped = []
+    if is_partitioned():
+        cutoff = datetime.combine(cutoff.date(), datetime.min.time())
+        dropped = drop_expired_partitions(cutoff)
+    deleted = delete_expired_readings(cutoff)
+
+    # Readings behind these pointers are gone; last_seen/last_rssi stay valid
+    db.session.execute(
+        db.update(Laptop).where(Laptop.last_seen < cutoff, Laptop.last_reading_id.isnot(None)).values(
+            last_reading_id=None, status_version=Laptop.status_version + 1
+        ),
+        execution_options={'synchronize_session': False}
+    )
+    db.session.commit()
+    return dropped, deleted
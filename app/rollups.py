@@ -0,0 +1,215 @@
+from datetime import datetime, timedelta
+from app import db
+from app.models import SensorReading, SensorReadingRollup
+
+MINUTE = 60
+HOUR = 3600
+
+# Windows up to these sizes are served from raw readings / 1-minute buckets;
+# anything larger is served from 1-hour buckets.
+RAW_HISTORY_MAX_WINDOW = timedelta(hours=1)
+MINUTE_HISTORY_MAX_WINDOW = timedelta(days=2)
+
+# Upper bound on the time range aggregated per transaction
+ROLLUP_CHUNK = timedelta(days=1)
+
+_TRUNC_UNITS = {MINUTE: 'minute', HOUR: 'hour'}
+# Matches the format SQLAlchemy uses to store DateTime values in SQLite, so
+# buckets compare correctly against bound datetime parameters
+_SQLITE_FORMATS = {MINUTE: '%Y-%m-%d %H:%M:00.000000', HOUR: '%Y-%m-%d %H:00:00.000000'}
+_MYSQL_FORMATS = {MINUTE: '%Y-%m-%d %H:%i:00', HOUR: '%Y-%m-%d %H:00:00'}
+
+_DISTANCE_COLUMNS = [
+    SensorReading.ultrasonic_distance_1_cm,
+    SensorReading.ultrasonic_distance_2_cm,
+    SensorReading.ultrasonic_distance_3_cm,
+    SensorReading.ultrasonic_distance_4_cm,
+]
+
+
+def floor_time(value, resolution):
+    epoch = datetime(1970, 1, 1)
+    seconds = int((value - epoch).total_seconds())
+    return epoch + timedelta(seconds=seconds - seconds % resolution)
+
+
+def _bucket(column, resolution):
+    dialect = db.engine.dialect.name
+    if dialect == 'postgresql':
+        return db.func.date_trunc(_TRUNC_UNITS[resolution], column)
+    if dialect == 'mysql':
+        return db.func.date_format(column, _MYSQL_FORMATS[resolution])
+    return db.func.strftime(_SQLITE_FORMATS[resolution], column)
+
+
+def _minute_aggregates():
+    """Columns of a 1-minute rollup computed from raw readings."""
+    bucket = _bucket(SensorReading.timestamp, MINUTE)
+    columns = {
+        'laptop_id': SensorReading.laptop_id,
+        'resolution': db.literal(MINUTE),
+        'bucket_start': bucket,
+        'reading_count': db.func.count(),
+        'intrusion_count': db.func.sum(db.case((SensorReading.ultrasonic_intrusion_detected == db.true(), 1), else_=0)),
+        'rssi_min': db.func.min(SensorReading.ibeacon_rssi),
+        'rssi_avg': db.func.avg(SensorReading.ibeacon_rssi),
+        'rssi_max': db.func.max(SensorReading.ibeacon_rssi),
+    }
+    for number, column in enumerate(_DISTANCE_COLUMNS, start=1):
+        columns[f'distance_{number}_min_cm'] = db.func.min(column)
+        columns[f'distance_{number}_avg_cm'] = db.func.avg(column)
+        columns[f'distance_{number}_max_cm'] = db.func.max(column)
+    return columns, SensorReading.timestamp, [SensorReading.laptop_id, bucket]
+
+
+def _hour_aggregates():
+    """Columns of a 1-hour rollup computed from the 1-minute rollups."""
+    minute = SensorReadingRollup
+    bucket = _bucket(minute.bucket_start, HOUR)
+
+    def weighted_avg(column):
+        # Averages are weighted by the number of readings in each minute
+        return db.func.sum(column * minute.reading_count) / db.func.sum(
+            db.case((column.isnot(None), minute.reading_count))
+        )
+
+    columns = {
+        'laptop_id': minute.laptop_id,
+        'resolution': db.literal(HOUR),
+        'bucket_start': bucket,
+        'reading_count': db.func.sum(minute.reading_count),
+        'intrusion_count': db.func.sum(minute.intrusion_count),
+        'rssi_min': db.func.min(minute.rssi_min),
+        'rssi_avg': weighted_avg(minute.rssi_avg),
+        'rssi_max': db.func.max(minute.rssi_max),
+    }
+    for number in range(1, 5):
+        columns[f'distance_{number}_min_cm'] = db.func.min(getattr(minute, f'distance_{number}_min_cm'))
+        columns[f'distance_{number}_avg_cm'] = weighted_avg(getattr(minute, f'distance_{number}_avg_cm'))
+        columns[f'distance_{number}_max_cm'] = db.func.max(getattr(minute, f'distance_{number}_max_cm'))
+    return columns, minute.bucket_start, [minute.laptop_id, bucket]
+
+
+def _aggregate(resolution, start, end):
+    """Recomputes all buckets of the given resolution in [start, end)."""
+    if resolution == MINUTE:
+        columns, time_column, group_by = _minute_aggregates()
+        source_filter = []
+    else:
+        columns, time_column, group_by = _hour_aggregates()
+        source_filter = [SensorReadingRollup.resolution == MINUTE]
+
+    db.session.execute(
+        db.delete(SensorReadingRollup).where(
+            SensorReadingRollup.resolution == resolution,
+            SensorReadingRollup.bucket_start >= start,
+            SensorReadingRollup.bucket_start < end
+        ),
+        execution_options={'synchronize_session': False}
+    )
+    select = db.select(*columns.values()).where(
+        time_column >= start, time_column < end, *source_filter
+    ).group_by(*group_by)
+    db.session.execute(db.insert(SensorReadingRollup).from_select(list(columns), select))
+    db.session.commit()
+
+
+def _watermark(resolution):
+    """Start of the oldest bucket that may still be incomplete."""
+    latest = db.session.query(db.func.max(SensorReadingRollup.bucket_start)).filter(
+        SensorReadingRollup.resolution == resolution
+    ).scalar()
+    if latest is not None:
+        return latest
+    if resolution == MINUTE:
+        oldest = db.session.query(db.func.min(SensorReading.timestamp)).scalar()
+    else:
+        oldest = db.session.query(db.func.min(SensorReadingRollup.bucket_start)).filter(
+            SensorReadingRollup.resolution == MINUTE
+        ).scalar()
+    return floor_time(oldest, resolution) if oldest is not None else None
+
+
+def update_rollups(since=None, now=None):
+    """
+    Brings the 1-minute and 1-hour rollups up to date with the raw readings.
+
+    Only completed buckets are written. Aggregation resumes at the newest
+    existing bucket, or at since when given (e.g. to pick up readings that a
+    gateway delivered late). Returns the number of buckets processed per
+    resolution.
+    """
+    now = now or datetime.utcnow()
+    processed = {}
+    for resolution in (MINUTE, HOUR):
+        start = floor_time(since, resolution) if since else _watermark(resolution)
+        end = floor_time(now, resolution)
+        processed[resolution] = 0
+        if start is None:
+            continue
+        while start < end:
+            chunk_end = min(start + ROLLUP_CHUNK, end)
+            _aggregate(resolution, start, chunk_end)
+            processed[resolution] += int((chunk_end - start).total_seconds()) // resolution
+            start = chunk_end
+    return processed
+
+
+def _range(minimum, average, maximum):
+    return {'min': minimum, 'avg': average, 'max': maximum}
+
+
+def _raw_history(laptop_id, start, end):
+    readings = SensorReading.query.filter(
+        SensorReading.laptop_id == laptop_id,
+        SensorReading.timestamp >= start,
+        SensorReading.timestamp < end
+    ).order_by(SensorReading.timestamp).all()
+    points = []
+    for reading in readings:
+        distances = [getattr(reading, f'ultrasonic_distance_{number}_cm') for number in range(1, 5)]
+        points.append({
+            'timestamp': reading.timestamp.strftime('%Y-%m-%d %H:%M:%S'),
+            'count': 1,
+            'intrusions': 1 if reading.ultrasonic_intrusion_detected else 0,
+            'rssi': _range(reading.ibeacon_rssi, reading.ibeacon_rssi, reading.ibeacon_rssi),
+            'distances_cm': [_range(distance, distance, distance) for distance in distances],
+        })
+    return points
+
+
+def _rollup_history(laptop_id, resolution, start, end):
+    rollups = SensorReadingRollup.query.filter(
+        SensorReadingRollup.laptop_id == laptop_id,
+        SensorReadingRollup.resolution == resolution,
+        SensorReadingRollup.bucket_start >= floor_time(start, resolution),
+        SensorReadingRollup.bucket_start < end
+    ).order_by(SensorReadingRollup.bucket_start).all()
+    return [{
+        'timestamp': rollup.bucket_start.strftime('%Y-%m-%d %H:%M:%S'),
+        'count': rollup.reading_count,
+        'intrusions': rollup.intrusion_count,
+        'rssi': _range(rollup.rssi_min, rollup.rssi_avg, rollup.rssi_max),
+        'distances_cm': [
+            _range(
+                getattr(rollup, f'distance_{number}_min_cm'),
+                getattr(rollup, f'distance_{number}_avg_cm'),
+                getattr(rollup, f'distance_{number}_max_cm')
+            )
+            for number in range(1, 5)
+        ],
+    } for rollup in rollups]
+
+
+def laptop_history(laptop_id, start, end):
+    """
+    Returns (resolution, points) for the laptop between start and end, using
+    the coarsest data that still gives a useful number of points, so the cost
+    of a chart does not depend on the age or length of the window.
+    """
+    window = end - start
+    if window <= RAW_HISTORY_MAX_WINDOW:
+        return 'raw', _raw_history(laptop_id, start, end)
+    if window <= MINUTE_HISTORY_MAX_WINDOW:
+        return '1m', _rollup_history(laptop_id, MINUTE, start, end)
+    return '1h', _rollup_history(laptop_id, HOUR, start, end)
@@ -1,19 +1,32 @@
-from flask import render_template, flash, redirect, url_for, request, jsonify, current_app
+from flask import render_template, flash, redirect, url_for, request, jsonify, current_app, Response, abort
 from flask_login import current_user, login_user, logout_user, login_required
 from app import app, db
 from app.forms import LoginForm, RegistrationForm, LaptopForm
-from app.models import User, Laptop, SensorReading
-from app.ibeacon_scanner import scan_for_ibeacons
+from app.models import User, Laptop, SensorReading, Gateway
+from app.scan_jobs import scan_jobs
+from app.ibeacon_scanner import ScannerUnavailable
+from app.ingest import ingest_readings, refresh_latest_reading, forget_laptop, MAX_BATCH_SIZE
+from app.status_stream import status_broker
+from app.status import update_statuses, status_cache, MAX_TRANSITIONS
+from app.cache import laptop_cache
+from app.rollups import laptop_history
+from app.gateways import gateway_assignment, bump_assignment_version
+from app.timestamps import naive_utc
+from app.instrumentation import request_metrics
+from werkzeug.exceptions import RequestEntityTooLarge
 from urllib.parse import urlparse
 from datetime import datetime, timedelta
-import asyncio
+import json
+import zlib
+
+MAX_DECOMPRESSED_BODY = 16 * 1024 * 1024
 
 @app.route('/')
 @app.route('/index')
 @login_required
 def index():
-    laptops = current_user.laptops.all()
-    return render_template('index.html', title='Dashboard', laptops=laptops, db=db, SensorReading=SensorReading)
+    laptops = current_user.laptops.order_by(Laptop.id).all()
+    return render_template('index.html', title='Dashboard', laptops=laptops)
 
 @app.route('/login', methods=['GET', 'POST'])
 def login():
@@ -60,6 +73,9 @@ def register():
 @login_required
 def add_laptop():
     form = LaptopForm()
+    form.gateway.choices = [(0, 'None')] + [
+        (gateway.id, gateway.name) for gateway in Gateway.query.order_by(Gateway.name)
+    ]
     if form.validate_on_submit():
         uuid = request.form.get('ibeacon_uuid')
         major = request.form.get('ibeacon_major')
@@ -75,19 +91,23 @@ def add_laptop():
                 ibeacon_uuid=uuid,
                 ibeacon_major=int(major),
                 ibeacon_minor=int(minor),
-                ibeacon_mac_address=mac_address
+                ibeacon_mac_address=mac_address,
+                ibeacon_tx_power=form.ibeacon_tx_power.data,
+                ultrasonic_sensor_index=form.ultrasonic_sensor.data - 1 if form.ultrasonic_sensor.data else None,
+                rssi_threshold=form.rssi_threshold.data,
+                min_distance_cm=form.min_distance_cm.data,
+                max_distance_cm=form.max_distance_cm.data,
+                gateway_id=form.gateway.data or None
             )
             db.session.add(laptop)
+            bump_assignment_version(laptop.gateway_id)
             db.session.commit()
+            laptop_cache.invalidate(laptop.serial_number)
 
             if rssi:
                 # This is the corrected version
                 initial_reading = SensorReading(
-                    ibeacon_uuid=uuid,
-                    ibeacon_major=int(major),
-                    ibeacon_minor=int(minor),
                     ibeacon_rssi=int(rssi),
-                    ibeacon_mac_address=mac_address,
                     ultrasonic_distance_1_cm=0.0, # <-- Corrected column names
                     ultrasonic_distance_2_cm=0.0,
                     ultrasonic_distance_3_cm=0.0,
@@ -95,6 +115,8 @@ def add_laptop():
                     laptop_id=laptop.id
                 )
                 db.session.add(initial_reading)
+                db.session.flush()
+                refresh_latest_reading([laptop.id])
                 db.session.commit()
 
             flash(f"Laptop '{laptop.name}' has been added!", 'success')
@@ -105,28 +127,53 @@ def add_laptop():
 
     return render_template('add_laptop.html', title='Add a New Laptop', form=form)
 
+def _scan_job_status(job, after=0):
+    used = db.session.query(Laptop.ibeacon_uuid, Laptop.ibeacon_major, Laptop.ibeacon_minor).all()
+    used_set = set(used)
+    beacons = job.beacons(after)
+
+    available_beacons = [
+        b for b in beacons
+        if (b['uuid'], b['major'], b['minor']) not in used_set
+    ]
+    return {
+        'success': True,
+        'job_id': job.id,
+        'state': job.state,
+        'beacons': available_beacons,
+        'next': after + len(beacons)
+    }
+
 @app.route('/scan_ibeacons', methods=['POST'])
 @login_required
 def scan_ibeacons():
+    """
+    Returns the beacons currently seen by the shared scanner. While the
+    scanner is still warming up, the returned job keeps collecting beacons.
+    """
     try:
-        used = db.session.query(Laptop.ibeacon_uuid, Laptop.ibeacon_major, Laptop.ibeacon_minor).all()
-        used_set = set(used)
-        beacons_found = asyncio.run(scan_for_ibeacons(scan_duration=10))
-
-        available_beacons = [
-            b for b in beacons_found
-            if (b['uuid'], b['major'], b['minor']) not in used_set
-        ]
-
-        if available_beacons:
-            print(f"Found {len(beacons_found)} beacons, {len(available_beacons)} are available.")
-            return jsonify({'success': True, 'beacons': available_beacons})
-        else:
-            return jsonify({'success': False, 'message': 'No new iBeacons found.'})
+        job = scan_jobs.start_or_join()
+        return jsonify(_scan_job_status(job)), 202
+    except ScannerUnavailable as e:
+        current_app.logger.warning(f"iBeacon scanner unavailable: {e}")
+        return jsonify({'success': False, 'message': str(e)}), 503
     except Exception as e:
         current_app.logger.error(f"Error scanning for iBeacons: {e}")
         return jsonify({'success': False, 'message': str(e)}), 500
 
+@app.route('/scan_ibeacons/<string:job_id>', methods=['GET'])
+@login_required
+def get_scan_job(job_id):
+    """
+    Returns the state of a scan job and the available beacons discovered so
+    far. Pass the previous response's `next` value as ?after= to only get
+    beacons discovered since then.
+    """
+    job = scan_jobs.get(job_id)
+    if job is None:
+        return jsonify({'success': False, 'message': 'Scan not found'}), 404
+    return jsonify(_scan_job_status(job, request.args.get('after', 0, type=int)))
+
 @app.route('/delete_laptop/<int:laptop_id>', methods=['POST'])
 @login_required
 def delete_laptop(laptop_id):
@@ -136,7 +183,12 @@ def delete_laptop(laptop_id):
         return redirect(url_for('index'))
 
     db.session.delete(laptop)
+    bump_assignment_version(laptop.gateway_id)
     db.session.commit()
+    status_broker.forget(laptop_id)
+    forget_laptop(laptop_id)
+    status_cache.forget(laptop_id)
+    laptop_cache.invalidate(laptop.serial_number)
     flash('Laptop has been deleted.', 'success')
     return redirect(url_for('index'))
 
@@ -144,94 +196,242 @@ def delete_laptop(laptop_id):
 @login_required
 def laptop_details(laptop_id):
     laptop = Laptop.query.filter_by(id=laptop_id, user_id=current_user.id).first_or_404()
-    last_reading = SensorReading.query.filter_by(laptop_id=laptop_id).order_by(db.desc(SensorReading.timestamp)).first()
-    return render_template('laptop_details.html', title='Laptop Details', laptop=laptop, last_reading=last_reading)
+    return render_template('laptop_details.html', title='Laptop Details', laptop=laptop)
 
 @app.route('/api/sensor_data', methods=['POST'])
 def receive_sensor_data():
     try:
-        data = request.get_json()
-        required = ['serial_number', 'ibeacon_rssi', 'ultrasonic_distances']
-        if not all(field in data for field in required):
+        data = request.get_json(silent=True)
+        if not isinstance(data, dict):
             return jsonify({'error': 'Missing required fields'}), 400
 
-        laptop = Laptop.query.filter_by(serial_number=data['serial_number']).first()
-        if not laptop:
-            return jsonify({'error': 'Laptop not found'}), 404
-
-        distances = data.get('ultrasonic_distances', [0.0, 0.0, 0.0, 0.0])
-        new_reading = SensorReading(
-            ibeacon_uuid=laptop.ibeacon_uuid,
-            ibeacon_major=laptop.ibeacon_major,
-            ibeacon_minor=laptop.ibeacon_minor,
-            ibeacon_rssi=data['ibeacon_rssi'],
-            ultrasonic_distance_1_cm=distances[0],
-            ultrasonic_distance_2_cm=distances[1],
-            ultrasonic_distance_3_cm=distances[2],
-            ultrasonic_distance_4_cm=distances[3],
-            laptop_id=laptop.id
-        )
-
-        db.session.add(new_reading)
-        db.session.commit()
+        result = ingest_readings([data])[0]
+        if result['status'] != 'ok':
+            status_code = 404 if result['error'] == 'Laptop not found' else 400
+            return jsonify({'error': result['error']}), status_code
 
-        # check_security_status(laptop, new_reading)  # Optional logic
         return jsonify({'message': 'Sensor data received successfully'}), 200
 
     except Exception as e:
         app.logger.error(f"Error processing sensor data: {e}")
         return jsonify({'error': 'Internal server error'}), 500
 
-def check_security_status(laptop, reading):
-    rssi_threshold = -80
-    ultrasonic_threshold = 200
-
-    is_out_of_range = reading.ibeacon_rssi < rssi_threshold
-    is_far_away = reading.ultrasonic_distance_cm > ultrasonic_threshold
-
-    laptop.is_stolen = is_out_of_range or is_far_away
-    db.session.commit()
+def _get_json_body():
+    """
+    Like request.get_json(), but also accepts gzip-compressed bodies from the
+    gateways. Raises ValueError if the body isn't JSON.
+    """
+    if request.content_encoding != 'gzip':
+        data = request.get_json(silent=True)
+        if data is None:
+            raise ValueError('Invalid JSON body')
+        return data
+    decompressor = zlib.decompressobj(wbits=16 + zlib.MAX_WBITS)
+    body = decompressor.decompress(request.get_data(), MAX_DECOMPRESSED_BODY)
+    if decompressor.unconsumed_tail:
+        raise RequestEntityTooLarge()
+    return json.loads(body)
+
+@app.route('/api/sensor_data/batch', methods=['POST'])
+def receive_sensor_data_batch():
+    try:
+        data = _get_json_body()
+        readings = data.get('readings') if isinstance(data, dict) else data
+        if not isinstance(readings, list):
+            return jsonify({'error': 'Expected a list of readings'}), 400
+        if len(readings) > MAX_BATCH_SIZE:
+            return jsonify({'error': f'Batch too large (max {MAX_BATCH_SIZE} readings)'}), 413
+
+        results = ingest_readings(readings)
+        stored = sum(1 for result in results if result['status'] == 'ok')
+        return jsonify({
+            'received': len(results),
+            'stored': stored,
+            'results': results
+        }), 200
+
+    except RequestEntityTooLarge:
+        return jsonify({'error': 'Request body too large'}), 413
+    except (zlib.error, ValueError):
+        return jsonify({'error': 'Invalid request body'}), 400
+    except Exception as e:
+        db.session.rollback()
+        app.logger.error(f"Error processing sensor data batch: {e}")
+        return jsonify({'error': 'Internal server error'}), 500
 
 @app.route('/api/latest_reading/<int:laptop_id>', methods=['GET'])
 @login_required
 def get_latest_reading(laptop_id):
     laptop = Laptop.query.filter_by(id=laptop_id, owner=current_user).first_or_404()
-    last_reading = SensorReading.query.filter_by(laptop_id=laptop.id).order_by(db.desc(SensorReading.timestamp)).first()
-
-    if last_reading:
+    if laptop.last_seen:
         return jsonify({
-            'rssi': last_reading.ibeacon_rssi,
-            'timestamp': last_reading.timestamp.strftime('%Y-%m-%d %H:%M:%S')
+            'rssi': laptop.last_rssi,
+            'timestamp': laptop.last_seen.strftime('%Y-%m-%d %H:%M:%S')
         })
     else:
         return jsonify({'rssi': 'N/A', 'timestamp': 'N/A'})
 
+@app.route('/api/laptop_history/<int:laptop_id>', methods=['GET'])
+@login_required
+def get_laptop_history(laptop_id):
+    """
+    Returns RSSI, distance and intrusion history for a laptop. Takes either
+    start/end (ISO 8601) or hours (default 24) and picks raw readings, 1-minute
+    or 1-hour buckets depending on the length of the window.
+    """
+    laptop = Laptop.query.filter_by(id=laptop_id, owner=current_user).first_or_404()
+    try:
+        end = naive_utc(datetime.fromisoformat(request.args['end'])) if 'end' in request.args else datetime.utcnow()
+        if 'start' in request.args:
+            start = naive_utc(datetime.fromisoformat(request.args['start']))
+        else:
+            start = end - timedelta(hours=float(request.args.get('hours', 24)))
+    except (ValueError, OverflowError):
+        return jsonify({'error': 'Invalid time range'}), 400
+    if start >= end:
+        return jsonify({'error': 'Invalid time range'}), 400
+
+    resolution, points = laptop_history(laptop.id, start, end)
+    return jsonify({
+        'laptop_id': laptop.id,
+        'start': start.strftime('%Y-%m-%d %H:%M:%S'),
+        'end': end.strftime('%Y-%m-%d %H:%M:%S'),
+        'resolution': resolution,
+        'points': points
+    })
+
 @app.route('/api/laptop_status/<string:serial_number>', methods=['POST'])
 def update_laptop_status(serial_number):
-    data = request.get_json()
-    is_stolen = data.get('is_stolen')
+    data = request.get_json(silent=True)
+    is_stolen = data.get('is_stolen') if isinstance(data, dict) else None
 
-    if is_stolen is None:
+    if not isinstance(is_stolen, bool):
         return jsonify({"message": "Invalid status provided"}), 400
 
-    laptop = Laptop.query.filter_by(serial_number=serial_number).first()
-    if not laptop:
-        return jsonify({"message": "Laptop not found"}), 404
-
-    laptop.is_stolen = is_stolen
-    db.session.commit()
+    result, = update_statuses([{'serial_number': serial_number, 'is_stolen': is_stolen}])
+    if result['status'] == 'error':
+        return jsonify({"message": result['error']}), 404
 
     return jsonify({"message": f"Laptop {serial_number} stolen status updated to {is_stolen}"}), 200
 
-@app.route('/api/laptop_status/<int:laptop_id>', methods=['GET'])
-def get_laptop_status(laptop_id):
-    laptop = Laptop.query.get_or_404(laptop_id)
-    last_reading = laptop.readings.order_by(db.desc(SensorReading.timestamp)).first()
+@app.route('/api/laptop_status/batch', methods=['POST'])
+def update_laptop_status_batch():
+    """
+    Applies many stolen-status transitions at once, e.g. when a gateway
+    reboots and reports all of its laptops. Takes {"transitions": [...]} or a
+    bare list of {serial_number, is_stolen, observed_at} objects.
+    """
+    try:
+        data = _get_json_body()
+        transitions = data.get('transitions') if isinstance(data, dict) else data
+        if not isinstance(transitions, list):
+            return jsonify({'error': 'Expected a list of transitions'}), 400
+        if len(transitions) > MAX_TRANSITIONS:
+            return jsonify({'error': f'Batch too large (max {MAX_TRANSITIONS} transitions)'}), 413
+
+        results = update_statuses(transitions)
+        return jsonify({
+            'received': len(results),
+            'updated': sum(1 for result in results if result['status'] == 'updated'),
+            'results': results
+        }), 200
+
+    except RequestEntityTooLarge:
+        return jsonify({'error': 'Request body too large'}), 413
+    except (zlib.error, ValueError):
+        return jsonify({'error': 'Invalid request body'}), 400
+    except Exception as e:
+        db.session.rollback()
+        app.logger.error(f"Error processing laptop status batch: {e}")
+        return jsonify({'error': 'Internal server error'}), 500
 
-    return jsonify({
+def _laptop_status(laptop):
+    return {
         "id": laptop.id,
         "serial_number": laptop.serial_number,
         "is_stolen": laptop.is_stolen,
-        "last_rssi": last_reading.ibeacon_rssi if last_reading else None,
-        "last_seen": last_reading.timestamp.strftime('%Y-%m-%d %H:%M:%S') if last_reading else None,
+        "last_rssi": laptop.last_rssi,
+        "last_seen": laptop.last_seen.strftime('%Y-%m-%d %H:%M:%S') if laptop.last_seen else None,
+    }
+
+@app.route('/api/laptop_status/<int:laptop_id>', methods=['GET'])
+def get_laptop_status(laptop_id):
+    laptop = Laptop.query.get_or_404(laptop_id)
+    return jsonify(_laptop_status(laptop))
+
+def _laptops_status_etag(user_id):
+    """
+    A validator for the status of a user's laptops, from one aggregate query.
+    Every write to a laptop's status increments its status_version, so the
+    sum of those changes with any status change; the count and highest id
+    change when laptops are added or deleted.
+    """
+    row = db.session.query(
+        db.func.count(Laptop.id),
+        db.func.coalesce(db.func.max(Laptop.id), 0),
+        db.func.coalesce(db.func.sum(Laptop.status_version), 0)
+    ).filter(Laptop.user_id == user_id).one()
+    return '-'.join(str(value) for value in row)
+
+@app.route('/api/laptops/status', methods=['GET'])
+@login_required
+def get_laptops_status():
+    """
+    Returns the status of all of the current user's laptops in one response.
+    The response carries an ETag, so polls with a matching If-None-Match
+    header get an empty 304 when nothing has changed, without loading the
+    laptops.
+    """
+    etag = _laptops_status_etag(current_user.id)
+    if request.if_none_match.contains(etag):
+        response = Response(status=304)
+    else:
+        laptops = current_user.laptops.order_by(Laptop.id).all()
+        response = jsonify({
+            'laptops': [_laptop_status(laptop) for laptop in laptops]
+        })
+    response.set_etag(etag)
+    return response
+
+@app.route('/api/gateways/<name>/assignment', methods=['GET'])
+def get_gateway_assignment(name):
+    """
+    The laptops, beacons and sensors a gateway monitors. Gateways poll this
+    with If-None-Match and get an empty 304 until their assignment changes.
+    """
+    gateway = Gateway.query.filter_by(name=name).first()
+    if gateway is None:
+        return jsonify({'error': 'Gateway not found'}), 404
+    response = jsonify(gateway_assignment(gateway))
+    response.add_etag()
+    return response.make_conditional(request)
+
+@app.route('/api/laptops/stream', methods=['GET'])
+@login_required
+def stream_laptops_status():
+    """
+    Server-Sent Events stream of status changes for the current user's laptops.
+    The first event is a full snapshot; later events only carry changed fields.
+    Pass ?laptop_id=<id> to follow a single laptop.
+    """
+    laptop_id = request.args.get('laptop_id', type=int)
+    snapshot = [
+        _laptop_status(laptop)
+        for laptop in current_user.laptops.order_by(Laptop.id)
+        if laptop_id is None or laptop.id == laptop_id
+    ]
+    stream = status_broker.stream(current_user.id, snapshot, laptop_id=laptop_id)
+    # The stream only reads from the broker. Without a request context kept
+    # alive for it, it doesn't hold on to a pooled database connection.
+    db.session.remove()
+    return Response(stream, mimetype='text/event-stream', headers={
+        'Cache-Control': 'no-cache',
+        'X-Accel-Buffering': 'no'
     })
+
+@app.route('/metrics', methods=['GET'])
+def metrics():
+    """Request metrics in the Prometheus text format; only served when instrumentation is enabled."""
+    if not app.config['INSTRUMENTATION_ENABLED']:
+        abort(404)
+    return Response(request_metrics.render(), mimetype='text/plain; version=0.0.4')
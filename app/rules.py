@@ -0,0 +1,105 @@
+import threading
+from flask import current_app
+from app import db
+from app.models import Laptop
+from sensing.ultrasonic import distance_out_of_range
+
+
+class Rule:
+    """The security thresholds of one laptop, with the site-wide defaults filled in."""
+
+    __slots__ = ('rssi_threshold', 'distance_column', 'min_distance_cm', 'max_distance_cm')
+
+    def __init__(self, rssi_threshold, sensor_index, min_distance_cm, max_distance_cm):
+        self.rssi_threshold = rssi_threshold
+        self.distance_column = f'ultrasonic_distance_{sensor_index + 1}_cm' if sensor_index is not None else None
+        self.min_distance_cm = min_distance_cm
+        self.max_distance_cm = max_distance_cm
+
+    def intrusion(self, reading):
+        """True if the laptop's ultrasonic sensor reads a distance outside its allowed range."""
+        if self.distance_column is None:
+            return False
+        return distance_out_of_range(reading[self.distance_column], self.min_distance_cm, self.max_distance_cm)
+
+    def out_of_range(self, reading):
+        if self.rssi_threshold is None:
+            return False
+        rssi = reading.get('ibeacon_rssi_filtered')
+        if rssi is None:
+            rssi = reading['ibeacon_rssi']
+        return rssi < self.rssi_threshold
+
+
+class RuleEngine:
+    """
+    Evaluates the security rules of each laptop against ingested readings.
+
+    Rules are compiled once per laptop and kept in process memory; call
+    invalidate() when a laptop's thresholds change or it is deleted.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._rules = {}
+
+    def invalidate(self, laptop_id=None):
+        with self._lock:
+            if laptop_id is None:
+                self._rules.clear()
+            else:
+                self._rules.pop(laptop_id, None)
+
+    def rules_for(self, laptop_ids):
+        """Returns the rules of the given laptops, compiling missing ones with one query."""
+        with self._lock:
+            rules = {laptop_id: self._rules[laptop_id] for laptop_id in laptop_ids if laptop_id in self._rules}
+        missing = set(laptop_ids) - rules.keys()
+        if missing:
+            config = current_app.config
+            rows = db.session.query(
+                Laptop.id, Laptop.ultrasonic_sensor_index, Laptop.rssi_threshold,
+                Laptop.min_distance_cm, Laptop.max_distance_cm
+            ).filter(Laptop.id.in_(missing)).all()
+            compiled = {
+                row.id: Rule(
+                    row.rssi_threshold if row.rssi_threshold is not None else config['SECURITY_RSSI_THRESHOLD'],
+                    row.ultrasonic_sensor_index,
+                    row.min_distance_cm if row.min_distance_cm is not None else config['SECURITY_MIN_DISTANCE_CM'],
+                    row.max_distance_cm if row.max_distance_cm is not None else config['SECURITY_MAX_DISTANCE_CM']
+                )
+                for row in rows
+            }
+            with self._lock:
+                self._rules.update(compiled)
+            rules.update(compiled)
+        return rules
+
+    def evaluate(self, readings):
+        """
+        Sets ultrasonic_intrusion_detected on every reading (column mappings as
+        built by ingest) and returns {laptop_id: (is_stolen, timestamp)} for the
+        newest reading of each laptop: whether it broke one of the laptop's
+        rules, and when it was taken.
+        """
+        rules = self.rules_for({reading['laptop_id'] for reading in readings})
+        newest = {}
+        for reading in readings:
+            laptop_id = reading['laptop_id']
+            rule = rules.get(laptop_id)
+            if rule is None:
+                continue
+            reading['ultrasonic_intrusion_detected'] = rule.intrusion(reading)
+            current = newest.get(laptop_id)
+            if current is None or reading['timestamp'] >= current['timestamp']:
+                newest[laptop_id] = reading
+        return {
+            laptop_id: (
+                reading['ultrasonic_intrusion_detected'] or rules[laptop_id].out_of_range(reading),
+                reading['timestamp']
+            )
+            for laptop_id, reading in newest.items()
+        }
+
+
+rule_engine = RuleEngine()
@@ -0,0 +1,99 @@
+import threading
+import time
+import uuid
+from app import app
+from app.ibeacon_scanner import IBeaconScannerService
+from sensing.ibeacon import uuid_whitelist
+
+
+class ScanJob:
+    """
+    A scan window over the shared scanner's cache. It starts with the beacons
+    already cached and collects beacons that appear until its deadline.
+    """
+
+    def __init__(self, deadline, beacons):
+        self.id = uuid.uuid4().hex
+        self.deadline = deadline
+        self._beacons = []
+        self._seen = set()
+        self._lock = threading.Lock()
+        for beacon in beacons:
+            self._add(beacon)
+
+    @property
+    def state(self):
+        return 'running' if time.time() < self.deadline else 'done'
+
+    def _add(self, beacon):
+        with self._lock:
+            if beacon['mac_address'] not in self._seen:
+                self._seen.add(beacon['mac_address'])
+                self._beacons.append(dict(beacon))
+
+    def add_beacon(self, beacon):
+        if time.time() < self.deadline:
+            self._add(beacon)
+
+    def beacons(self, after=0):
+        """Returns the beacons discovered after the first `after` ones, in discovery order."""
+        with self._lock:
+            return self._beacons[after:]
+
+
+class ScanJobManager:
+    """
+    Serves iBeacon scan requests from a shared, long-lived scanner. Beacons
+    already in the scanner's cache are returned immediately. A job only keeps
+    running (for at most scan_duration) while the scanner hasn't been up long
+    enough to have seen every beacon in range. Requests made while a job is
+    running join it.
+    """
+
+    def __init__(self, scanner, scan_duration=10, keep_finished=300):
+        self.scanner = scanner
+        self.scan_duration = scan_duration
+        self.keep_finished = keep_finished
+        self._lock = threading.Lock()
+        self._jobs = {}
+        self._current = None
+
+    def start_or_join(self):
+        """Raises ScannerUnavailable if the scanner can't be started."""
+        with self._lock:
+            self._prune()
+            if self._current is not None and self._current.state == 'running':
+                return self._current
+
+        # Starting the scanner can take seconds; don't hold up requests for
+        # other jobs meanwhile
+        started_at = self.scanner.start() or time.time()
+
+        with self._lock:
+            if self._current is not None and self._current.state == 'running':
+                # Another request started a job while the scanner came up
+                return self._current
+            warm_until = started_at + self.scan_duration
+            job = ScanJob(max(time.time(), warm_until), self.scanner.beacons())
+            if job.state == 'running':
+                self.scanner.add_listener(job.add_beacon)
+            self._jobs[job.id] = job
+            self._current = job
+            return job
+
+    def get(self, job_id):
+        with self._lock:
+            self._prune()
+            return self._jobs.get(job_id)
+
+    def _prune(self):
+        now = time.time()
+        for job_id, job in list(self._jobs.items()):
+            if now >= job.deadline:
+                self.scanner.remove_listener(job.add_beacon)
+            if now - job.deadline > self.keep_finished:
+                del self._jobs[job_id]
+
+
+scanner_service = IBeaconScannerService(uuids=uuid_whitelist(app.config['IBEACON_UUIDS']))
+scan_jobs = ScanJobManager(scanner_service)
@@ -0,0 +1,157 @@
+import threading
+import time
+from app import db
+from app.models import Laptop
+from app.status_stream import status_broker
+from app.cache import laptop_cache
+from app.timestamps import parse_timestamp
+
+MAX_TRANSITIONS = 1000
+
+
+class StatusCache:
+    """
+    In-process copy of every laptop's is_stolen flag and the time of the
+    transition that set it (Laptop.stolen_changed_at), so repeated and
+    out-of-order transitions can be discarded without touching the database.
+    Entries expire after ttl seconds, which bounds how long a change made by
+    another server process can go unnoticed; the UPDATEs that write the flag
+    check stolen_changed_at again, so a stale entry never lets an older
+    transition win.
+    """
+
+    def __init__(self, ttl=30):
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        self._entries = {}
+
+    def get_many(self, laptop_ids):
+        """Returns {laptop_id: (is_stolen, observed_at)}, loading missing entries with one query."""
+        now = time.monotonic()
+        with self._lock:
+            found = {
+                laptop_id: entry[:2] for laptop_id, entry in
+                ((laptop_id, self._entries.get(laptop_id)) for laptop_id in laptop_ids)
+                if entry is not None and entry[2] > now
+            }
+        missing = set(laptop_ids) - found.keys()
+        if missing:
+            rows = db.session.query(
+                Laptop.id, Laptop.is_stolen, Laptop.stolen_changed_at
+            ).filter(Laptop.id.in_(missing)).all()
+            for row in rows:
+                found[row.id] = (bool(row.is_stolen), row.stolen_changed_at)
+            with self._lock:
+                for row in rows:
+                    self._entries[row.id] = (bool(row.is_stolen), row.stolen_changed_at, now + self.ttl)
+        return found
+
+    def set(self, laptop_id, is_stolen, observed_at=None):
+        with self._lock:
+            self._entries[laptop_id] = (is_stolen, observed_at, time.monotonic() + self.ttl)
+
+    def forget(self, laptop_id):
+        with self._lock:
+            self._entries.pop(laptop_id, None)
+
+
+status_cache = StatusCache()
+
+
+def set_stolen(values):
+    """
+    Writes is_stolen for many laptops with a single UPDATE. values maps
+    laptop ids to (is_stolen, observed_at); a laptop whose flag was last
+    changed by a transition newer than observed_at is left alone. On
+    PostgreSQL this is an UPDATE ... FROM (VALUES ...); other databases get
+    CASE expressions. Returns the ids of the laptops that were written.
+    """
+    if not values:
+        return []
+    if db.engine.dialect.name == 'postgresql':
+        rows = db.values(
+            db.column('id', db.Integer), db.column('is_stolen', db.Boolean),
+            db.column('observed_at', db.DateTime), name='transitions'
+        ).data([(laptop_id, is_stolen, observed_at) for laptop_id, (is_stolen, observed_at) in values.items()])
+        statement = db.update(Laptop).where(Laptop.id == rows.c.id)
+        is_stolen, observed_at = rows.c.is_stolen, rows.c.observed_at
+    else:
+        statement = db.update(Laptop).where(Laptop.id.in_(values))
+        is_stolen = db.case({laptop_id: value[0] for laptop_id, value in values.items()}, value=Laptop.id)
+        observed_at = db.case({laptop_id: value[1] for laptop_id, value in values.items()}, value=Laptop.id)
+    statement = statement.where(
+        db.or_(Laptop.stolen_changed_at.is_(None), Laptop.stolen_changed_at <= observed_at)
+    ).values(is_stolen=is_stolen, stolen_changed_at=observed_at, status_version=Laptop.status_version + 1)
+    if not db.engine.dialect.update_returning:
+        db.session.execute(statement, execution_options={'synchronize_session': False})
+        return list(values)
+    return db.session.execute(
+        statement.returning(Laptop.id), execution_options={'synchronize_session': False}
+    ).scalars().all()
+
+
+def update_statuses(items):
+    """
+    Applies a batch of stolen-status transitions from the gateways.
+
+    Only the newest transition per laptop counts. It is discarded if it is
+    older than the last one applied or doesn't change the stored flag,
+    judged against the in-process status cache; the remaining changes are
+    written with a single UPDATE, which skips laptops whose stored
+    transition turns out to be newer. Returns one result dict per item, in the
+    same order as the input, with status 'updated', 'unchanged', 'stale' or
+    'error'.
+    """
+    results = []
+    serials = {
+        item['serial_number'] for item in items
+        if isinstance(item, dict) and isinstance(item.get('serial_number'), str)
+    }
+    laptops = laptop_cache.resolve(serials)
+
+    newest = {}
+    for index, item in enumerate(items):
+        if (not isinstance(item, dict) or not isinstance(item.get('serial_number'), str)
+                or not isinstance(item.get('is_stolen'), bool)):
+            results.append({'index': index, 'status': 'error', 'error': 'Missing or invalid fields'})
+            continue
+        result = {'index': index, 'serial_number': item['serial_number']}
+        results.append(result)
+        laptop = laptops.get(item['serial_number'])
+        if laptop is None:
+            result.update(status='error', error='Laptop not found')
+            continue
+        try:
+            observed_at = parse_timestamp(item.get('observed_at'))
+        except (TypeError, ValueError, OverflowError, OSError):
+            result.update(status='error', error='Invalid observed_at')
+            continue
+        result['status'] = 'stale'
+        current = newest.get(laptop.id)
+        if current is None or observed_at >= current[2]:
+            newest[laptop.id] = (result, item['is_stolen'], observed_at, laptop.user_id)
+
+    current_state = status_cache.get_many(newest)
+    changes = {}
+    for laptop_id, (result, is_stolen, observed_at, _) in newest.items():
+        current_stolen, current_observed_at = current_state.get(laptop_id, (None, None))
+        if current_observed_at is not None and observed_at < current_observed_at:
+            continue
+        if current_stolen == is_stolen:
+            result['status'] = 'unchanged'
+            status_cache.set(laptop_id, is_stolen, observed_at)
+            continue
+        changes[laptop_id] = (is_stolen, observed_at)
+
+    if changes:
+        changed = set_stolen(changes)
+        db.session.commit()
+        for laptop_id in changed:
+            result, is_stolen, observed_at, user_id = newest[laptop_id]
+            result['status'] = 'updated'
+            status_cache.set(laptop_id, is_stolen, observed_at)
+            status_broker.publish(user_id, laptop_id, is_stolen=is_stolen)
+        for laptop_id in changes.keys() - set(changed):
+            # Another process recorded a newer transition since the cache was filled
+            status_cache.forget(laptop_id)
+    return results
@@ -0,0 +1,82 @@
+import json
+import queue
+import threading
+
+
+class StatusBroker:
+    """
+    Fans out laptop status changes to Server-Sent Events subscribers.
+
+    The broker remembers the last published state of every laptop and only
+    forwards the fields that actually changed. It lives in process memory, so
+    publishers and subscribers must be served by the same server process.
+    """
+
+    def __init__(self, max_queue_size=256, keepalive_interval=15):
+        self.max_queue_size = max_queue_size
+        self.keepalive_interval = keepalive_interval
+        self._lock = threading.Lock()
+        self._subscribers = {}
+        self._last_state = {}
+
+    def subscribe(self, user_id):
+        events = queue.Queue(maxsize=self.max_queue_size)
+        with self._lock:
+            self._subscribers.setdefault(user_id, set()).add(events)
+        return events
+
+    def unsubscribe(self, user_id, events):
+        with self._lock:
+            subscribers = self._subscribers.get(user_id)
+            if subscribers is not None:
+                subscribers.discard(events)
+                if not subscribers:
+                    del self._subscribers[user_id]
+
+    def publish(self, user_id, laptop_id, **fields):
+        with self._lock:
+            previous = self._last_state.setdefault(laptop_id, {})
+            changes = {key: value for key, value in fields.items() if previous.get(key) != value}
+            if not changes:
+                return
+            previous.update(changes)
+            subscribers = list(self._subscribers.get(user_id, ()))
+
+        event = dict(changes, id=laptop_id)
+        for events in subscribers:
+            try:
+                events.put_nowait(event)
+            except queue.Full:
+                # A stalled client loses events; it resyncs from the snapshot
+                # sent when its EventSource reconnects.
+                pass
+
+    def forget(self, laptop_id):
+        with self._lock:
+            self._last_state.pop(laptop_id, None)
+
+    def stream(self, user_id, snapshot, laptop_id=None):
+        """
+        Yields SSE messages: the initial snapshot first, then every change for
+        the user's laptops (or a single laptop), with periodic keepalives.
+        """
+        events = self.subscribe(user_id)
+        try:
+            yield _format_event('snapshot', snapshot)
+            while True:
+                try:
+                    event = events.get(timeout=self.keepalive_interval)
+                except queue.Empty:
+                    yield ': keepalive\n\n'
+                    continue
+                if laptop_id is None or event['id'] == laptop_id:
+                    yield _format_event('status', event)
+        finally:
+            self.unsubscribe(user_id, events)
+
+
+def _format_event(name, data):
+    return f'event: {name}\ndata: {json.dumps(data)}\n\n'
+
+
+status_broker = StatusBroker()
@@ -0,0 +1,24 @@
+from datetime import datetime, timezone
+
+
+def naive_utc(value):
+    """Converts an aware datetime to the naive UTC datetimes the database stores. Naive ones are taken as UTC."""
+    if value.tzinfo is None:
+        return value
+    return value.astimezone(timezone.utc).replace(tzinfo=None)
+
+
+def parse_timestamp(value):
+    """
+    Parses a timestamp sent by a client: seconds since the epoch or an ISO
+    8601 string, with or without a UTC offset. None means now. Returns a
+    naive UTC datetime; raises TypeError, ValueError, OverflowError or
+    OSError for anything else.
+    """
+    if value is None:
+        return datetime.utcnow()
+    if isinstance(value, bool):
+        raise TypeError('A timestamp must be a number or a string')
+    if isinstance(value, (int, float)):
+        return datetime.utcfromtimestamp(value)
+    return naive_utc(datetime.fromisoformat(value))
@@ -0,0 +1,120 @@
+"""
+Fixtures of the benchmark suite: an in-memory SQLite database seeded once
+per session with a realistic fleet. Production holds about 10M readings;
+the default 200k keeps the suite fast, set BENCHMARK_READINGS to scale it.
+"""
+import itertools
+import os
+import random
+import time
+from datetime import datetime, timedelta
+
+# Read by config.py, so it must be set before the app is imported
+os.environ['DATABASE_URL'] = 'sqlite://'
+
+import pytest
+from app import app, db
+from app.models import User, Laptop, SensorReading
+from app.ingest import refresh_latest_reading
+
+LAPTOPS = int(os.environ.get('BENCHMARK_LAPTOPS', 1000))
+READINGS = int(os.environ.get('BENCHMARK_READINGS', 200000))
+USERS = 10
+PASSWORD = 'benchmark'
+HISTORY = timedelta(days=7)
+
+
+def serial_number(index):
+    return f'BENCH-{index:05d}'
+
+
+def _seed():
+    rng = random.Random(0)
+    users = [User(username=f'user{i}', email=f'user{i}@example.com') for i in range(USERS)]
+    for user in users:
+        user.set_password(PASSWORD)
+    db.session.add_all(users)
+    db.session.flush()
+
+    db.session.execute(db.insert(Laptop), [{
+        'name': f'Laptop {i}',
+        'serial_number': serial_number(i),
+        'user_id': users[i % USERS].id,
+        'ibeacon_uuid': 'e2c56db5dffb48d2b060d0f5a71096e0',
+        'ibeacon_major': 1,
+        'ibeacon_minor': i,
+        'ibeacon_mac_address': f'5A:00:00:00:{i >> 8:02X}:{i & 0xff:02X}',
+        'ultrasonic_sensor_index': i % 4,
+        'is_stolen': i % 50 == 0,
+    } for i in range(LAPTOPS)])
+    laptop_ids = [laptop_id for laptop_id, in db.session.query(Laptop.id).order_by(Laptop.id)]
+
+    # Readings are spread evenly over the history, every laptop reporting in turn
+    start = datetime.utcnow() - HISTORY
+    step = HISTORY / max(READINGS, 1)
+    chunk = 10000
+    for offset in range(0, READINGS, chunk):
+        db.session.execute(db.insert(SensorReading), [{
+            'timestamp': start + step * n,
+            'laptop_id': laptop_ids[n % len(laptop_ids)],
+            'ibeacon_rssi': rng.randint(-80, -50),
+            'ultrasonic_distance_1_cm': rng.uniform(15, 40),
+            'ultrasonic_distance_2_cm': rng.uniform(15, 40),
+            'ultrasonic_distance_3_cm': rng.uniform(15, 40),
+            'ultrasonic_distance_4_cm': rng.uniform(15, 40),
+            'ultrasonic_intrusion_detected': False,
+        } for n in range(offset, min(offset + chunk, READINGS))])
+    for i in range(0, len(laptop_ids), 500):
+        refresh_latest_reading(laptop_ids[i:i + 500])
+    db.session.commit()
+
+
+@pytest.fixture(scope='session')
+def seeded_app():
+    app.config.update(TESTING=True, WTF_CSRF_ENABLED=False)
+    # Seed in a context of its own; requests get their own contexts (and
+    # database sessions), as they do in production
+    with app.app_context():
+        db.create_all()
+        _seed()
+    yield app
+    with app.app_context():
+        db.drop_all()
+
+
+@pytest.fixture(scope='session')
+def user_laptops(seeded_app):
+    """Ids of the laptops owned by user0, the user the client is logged in as."""
+    with seeded_app.app_context():
+        user = User.query.filter_by(username='user0').one()
+        return [laptop_id for laptop_id, in db.session.query(Laptop.id).filter_by(user_id=user.id).order_by(Laptop.id)]
+
+
+@pytest.fixture(scope='session')
+def client(seeded_app):
+    """A test client logged in as user0."""
+    client = seeded_app.test_client()
+    response = client.post('/login', data={'username': 'user0', 'password': PASSWORD})
+    assert response.status_code == 302
+    return client
+
+
+@pytest.fixture(scope='session')
+def credentials():
+    """Login form data of a user other than the client's."""
+    return {'username': 'user1', 'password': PASSWORD}
+
+
+@pytest.fixture
+def payloads():
+    """Endless sensor_data payloads, going round-robin over the fleet's laptops."""
+    rng = random.Random(1)
+    return (
+        {
+            'serial_number': serial_number(i),
+            'ibeacon_rssi': rng.randint(-80, -50),
+            'ultrasonic_distances': [round(rng.uniform(15, 40), 1) for _ in range(4)],
+            'timestamp': time.time(),
+        }
+        for i in itertools.cycle(range(LAPTOPS))
+    )
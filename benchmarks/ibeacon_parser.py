@@ -0,0 +1,86 @@
+"""
+Micro-benchmark of the iBeacon advertisement parser over a corpus of
+advertisements, run from the repository root:
+
+    python benchmarks/ibeacon_parser.py [--corpus PATH] [--uuid UUID ...]
+
+It compares the previous slicing parser with sensing.ibeacon, without and
+with a UUID whitelist.
+"""
+import argparse
+import os
+import sys
+import timeit
+from types import SimpleNamespace
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from sensing.ibeacon import APPLE_COMPANY_ID, IBEACON_PREFIX, parse_ibeacon, uuid_whitelist
+
+DEFAULT_CORPUS = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'data', 'advertisements.txt')
+# UUIDs of the registered beacons in the default corpus
+DEFAULT_UUIDS = ['e2c56db5-dffb-48d2-b060-d0f5a71096e0', 'fda50693-a4e2-4fb1-afcf-c6eb07647825']
+
+
+def slicing_parser(advertisement_data):
+    """The parser app/ibeacon_scanner.py used before sensing.ibeacon."""
+    data = advertisement_data.manufacturer_data.get(APPLE_COMPANY_ID)
+    if data is None or data[0:2] != IBEACON_PREFIX:
+        return None
+    uuid = data[2:18].hex()
+    major = int.from_bytes(data[18:20], byteorder='big')
+    minor = int.from_bytes(data[20:22], byteorder='big')
+    return uuid, major, minor
+
+
+def load_corpus(path):
+    """Reads 'company_id data' hex lines into objects shaped like bleak's AdvertisementData."""
+    advertisements = []
+    with open(path) as f:
+        for line in f:
+            line = line.strip()
+            if not line or line.startswith('#'):
+                continue
+            company_id, data = line.split()
+            advertisements.append(SimpleNamespace(manufacturer_data={int(company_id, 16): bytes.fromhex(data)}))
+    return advertisements
+
+
+def measure(parse, advertisements, extra=(), repeat=7):
+    """Best time per advertisement in nanoseconds, and the number of beacons parsed."""
+    def run():
+        for advertisement in advertisements:
+            parse(advertisement, *extra)
+    number = max(1, 200000 // len(advertisements))
+    best = min(timeit.repeat(run, number=number, repeat=repeat))
+    parsed = sum(1 for advertisement in advertisements if parse(advertisement, *extra) is not None)
+    return best / number / len(advertisements) * 1e9, parsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--corpus', default=DEFAULT_CORPUS)
+    parser.add_argument('--uuid', action='append', dest='uuids', help='Registered beacon UUID (repeatable).')
+    args = parser.parse_args()
+
+    advertisements = load_corpus(args.corpus)
+    uuids = uuid_whitelist(args.uuids or DEFAULT_UUIDS)
+    candidates = [
+        ('slicing parser', slicing_parser, ()),
+        ('sensing.ibeacon', parse_ibeacon, ()),
+        ('sensing.ibeacon + whitelist', parse_ibeacon, (uuids,)),
+    ]
+    ibeacons = [advertisement for advertisement in advertisements if parse_ibeacon(advertisement) is not None]
+    others = [advertisement for advertisement in advertisements if parse_ibeacon(advertisement) is None]
+
+    print(f"{len(advertisements)} advertisements from {args.corpus}, {len(ibeacons)} of them iBeacons")
+    for label, corpus in (('all', advertisements), ('iBeacons', ibeacons), ('others', others)):
+        print(f"\n{label}:")
+        baseline = None
+        for name, parse, extra in candidates:
+            per_frame, parsed = measure(parse, corpus, extra)
+            baseline = baseline or per_frame
+            print(f"  {name:<30} {per_frame:8.1f} ns/advertisement  {baseline / per_frame:5.2f}x  {parsed} beacons")
+
+
+if __name__ == '__main__':
+    main()
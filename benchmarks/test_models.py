@@ -0,0 +1,47 @@
+"""Benchmarks of the data-access paths behind the routes, called directly."""
+import itertools
+from datetime import datetime, timedelta
+from app import db
+from app.cache import laptop_cache
+from app.ingest import ingest_readings, refresh_latest_reading
+from app.rollups import laptop_history
+
+
+def test_ingest_readings(benchmark, seeded_app, payloads):
+    def ingest():
+        with seeded_app.app_context():
+            return ingest_readings(list(itertools.islice(payloads, 100)))
+
+    results = benchmark(ingest)
+    assert all(result['status'] == 'ok' for result in results)
+
+
+def test_resolve_laptops_uncached(benchmark, seeded_app, payloads):
+    serial_numbers = [payload['serial_number'] for payload in itertools.islice(payloads, 100)]
+
+    def resolve():
+        laptop_cache.clear()
+        with seeded_app.app_context():
+            return laptop_cache.resolve(serial_numbers)
+
+    assert len(benchmark(resolve)) == len(serial_numbers)
+
+
+def test_refresh_latest_reading(benchmark, seeded_app, user_laptops):
+    def refresh():
+        with seeded_app.app_context():
+            refresh_latest_reading(user_laptops)
+            db.session.commit()
+
+    benchmark(refresh)
+
+
+def test_raw_history(benchmark, seeded_app, user_laptops):
+    laptop_ids = itertools.cycle(user_laptops)
+
+    def history():
+        end = datetime.utcnow()
+        with seeded_app.app_context():
+            return laptop_history(next(laptop_ids), end - timedelta(hours=1), end)
+
+    benchmark(history)
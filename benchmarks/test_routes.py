@@ -0,0 +1,48 @@
+"""Request benchmarks of the busiest routes, through the Flask test client."""
+import itertools
+
+
+def test_receive_sensor_data(benchmark, client, payloads):
+    def post():
+        return client.post('/api/sensor_data', json=next(payloads))
+
+    response = benchmark(post)
+    assert response.status_code == 200
+
+
+def test_receive_sensor_data_batch(benchmark, client, payloads):
+    def post():
+        return client.post('/api/sensor_data/batch', json={'readings': list(itertools.islice(payloads, 100))})
+
+    response = benchmark(post)
+    assert response.status_code == 200
+    assert response.get_json()['stored'] == 100
+
+
+def test_get_laptop_status(benchmark, client, user_laptops):
+    laptop_ids = itertools.cycle(user_laptops)
+    response = benchmark(lambda: client.get(f'/api/laptop_status/{next(laptop_ids)}'))
+    assert response.status_code == 200
+
+
+def test_laptop_details(benchmark, client, user_laptops):
+    laptop_ids = itertools.cycle(user_laptops)
+    response = benchmark(lambda: client.get(f'/laptop_details/{next(laptop_ids)}'))
+    assert response.status_code == 200
+
+
+def test_index(benchmark, client, user_laptops):
+    response = benchmark(lambda: client.get('/index'))
+    assert response.status_code == 200
+    assert response.data.count(b'/laptop_details/') >= len(user_laptops)
+
+
+def test_login(benchmark, seeded_app, credentials):
+    # A new client per round, since a logged-in client is redirected before
+    # the password is checked
+    def login():
+        return seeded_app.test_client().post('/login', data=credentials)
+
+    response = benchmark(login)
+    assert response.status_code == 302
+    assert response.headers['Location'].endswith('/index')
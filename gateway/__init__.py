@@ -0,0 +1 @@
+"""Building blocks shared by the Raspberry Pi gateway scripts."""
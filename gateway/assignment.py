@@ -0,0 +1,129 @@
+import asyncio
+import json
+import os
+from collections import namedtuple
+from types import MappingProxyType
+import aiohttp
+from sensing.ultrasonic import distance_out_of_range
+
+
+class AssignedLaptop(namedtuple('AssignedLaptop', [
+    'serial_number', 'mac_address', 'sensor_index', 'min_distance_cm', 'max_distance_cm', 'ibeacon_tx_power'
+])):
+    __slots__ = ()
+
+    def distance_out_of_range(self, distance):
+        return distance_out_of_range(distance, self.min_distance_cm, self.max_distance_cm)
+
+
+class Assignment:
+    """
+    Immutable snapshot of the laptops a gateway monitors, as served by
+    /api/gateways/<name>/assignment. The lookup tables are built once, so the
+    BLE detection callback only does a dict lookup per advertisement.
+    """
+
+    __slots__ = ('version', 'laptops', 'laptops_by_mac', 'macs')
+
+    def __init__(self, data):
+        self.version = data['version']
+        self.laptops = tuple(
+            AssignedLaptop(
+                laptop['serial_number'],
+                laptop['ibeacon_mac_address'].upper() if laptop.get('ibeacon_mac_address') else None,
+                laptop.get('ultrasonic_sensor_index'),
+                laptop.get('min_distance_cm'),
+                laptop.get('max_distance_cm'),
+                laptop.get('ibeacon_tx_power')
+            )
+            for laptop in data['laptops']
+        )
+        self.laptops_by_mac = MappingProxyType({laptop.mac_address: laptop for laptop in self.laptops if laptop.mac_address})
+        self.macs = frozenset(self.laptops_by_mac)
+
+
+class AssignmentClient:
+    """
+    Keeps the gateway's assignment in sync with the server.
+
+    The last assignment is cached on disk, so the gateway starts with it
+    even if the server is unreachable. The server is then polled with
+    conditional GETs; when the assignment changes, the new snapshot replaces
+    `current` in a single assignment and on_change is called with it.
+    """
+
+    def __init__(self, url, cache_path='gateway_assignment.json', poll_interval=30.0, timeout=5, on_change=None):
+        self.url = url
+        self.cache_path = cache_path
+        self.poll_interval = poll_interval
+        self.timeout = timeout
+        self.on_change = on_change
+        self.current = None
+        self._etag = None
+        self._session = None
+        self._poller = None
+
+    def _load_cache(self):
+        try:
+            with open(self.cache_path) as f:
+                cached = json.load(f)
+            self.current = Assignment(cached['assignment'])
+            self._etag = cached.get('etag')
+            print(f"Loaded cached assignment version {self.current.version} ({len(self.current.laptops)} laptops).")
+        except (OSError, ValueError, KeyError) as e:
+            print(f"No usable cached assignment ({e}).")
+
+    def _save_cache(self, data):
+        # Write to a temporary file first so a crash never leaves a truncated cache
+        temporary_path = f"{self.cache_path}.tmp"
+        with open(temporary_path, 'w') as f:
+            json.dump({'etag': self._etag, 'assignment': data}, f)
+        os.replace(temporary_path, self.cache_path)
+
+    async def refresh(self):
+        """Fetches the assignment if it changed. Returns True if a new one was applied."""
+        headers = {'If-None-Match': self._etag} if self._etag and self.current is not None else {}
+        async with self._session.get(self.url, headers=headers) as response:
+            if response.status == 304:
+                return False
+            response.raise_for_status()
+            data = await response.json()
+            etag = response.headers.get('ETag')
+
+        assignment = Assignment(data)
+        self._etag = etag
+        self._save_cache(data)
+        self.current = assignment
+        print(f"Applied assignment version {assignment.version} ({len(assignment.laptops)} laptops).")
+        if self.on_change is not None:
+            self.on_change(assignment)
+        return True
+
+    async def start(self):
+        """Loads the cached assignment, or waits until the server provides one, then starts polling."""
+        self._session = aiohttp.ClientSession(timeout=aiohttp.ClientTimeout(total=self.timeout))
+        self._load_cache()
+        while self.current is None:
+            try:
+                await self.refresh()
+            except (aiohttp.ClientError, asyncio.TimeoutError, ValueError, KeyError) as e:
+                print(f"Waiting for an assignment from the server ({e}).")
+                await asyncio.sleep(self.poll_interval)
+        self._poller = asyncio.create_task(self._poll())
+
+    async def _poll(self):
+        while True:
+            await asyncio.sleep(self.poll_interval)
+            try:
+                await self.refresh()
+            except (aiohttp.ClientError, asyncio.TimeoutError, ValueError, KeyError) as e:
+                print(f"Could not refresh the assignment ({e}), keeping version {self.current.version}.")
+
+    async def close(self):
+        if self._poller is not None:
+            self._poller.cancel()
+            await asyncio.gather(self._poller, return_exceptions=True)
+            self._poller = None
+        if self._session is not None:
+            await self._session.close()
+            self._session = None
@@ -0,0 +1,116 @@
+import time
+from collections import deque
+from sensing.rssi import RssiFilter
+
+
+class BeaconState:
+    __slots__ = ('sightings', 'present', 'last_seen', 'last_rssi', 'rssi_filter', 'tracked_since')
+
+    def __init__(self, history, tracked_since):
+        # (timestamp, rssi) of the most recent advertisements
+        self.sightings = deque(maxlen=history)
+        self.present = False
+        self.last_seen = None
+        self.last_rssi = None
+        self.rssi_filter = RssiFilter()
+        # When the beacon was added to the tracker
+        self.tracked_since = tracked_since
+
+
+class PresenceTracker:
+    """
+    Tracks which beacons are present from a rolling window of their
+    advertisements.
+
+    A beacon is only reported missing after miss_tolerance consecutive
+    advertisements were missed, so a single dropped advertisement doesn't
+    raise the alarm. It becomes present again only after present_after
+    advertisements within window seconds; the two thresholds give the state
+    hysteresis, so a beacon at the edge of the range doesn't flap between
+    present and missing.
+    """
+
+    def __init__(self, macs, window=6.0, advertising_interval=1.0, miss_tolerance=3, present_after=2, history=32):
+        self.window = window
+        self.miss_timeout = advertising_interval * (miss_tolerance + 1)
+        self.present_after = present_after
+        self.history = history
+        self._states = {}
+        self.set_macs(macs)
+
+    def set_macs(self, macs, now=None):
+        """
+        Changes the tracked beacons. Beacons that are still tracked keep their
+        state; new ones start out neither present nor missing (see is_missing).
+        """
+        if now is None:
+            now = time.time()
+        self._states = {mac: self._states.get(mac) or BeaconState(self.history, now) for mac in macs}
+
+    def observe(self, mac, rssi, now=None):
+        """Records an advertisement. Returns True if the beacon became present."""
+        state = self._states.get(mac)
+        if state is None:
+            return False
+        if now is None:
+            now = time.time()
+        state.sightings.append((now, rssi))
+        state.last_seen = now
+        state.last_rssi = rssi
+        state.rssi_filter.update(rssi, now)
+        if not state.present and self._recent_sightings(state, now) >= self.present_after:
+            state.present = True
+            return True
+        return False
+
+    def update(self, now=None):
+        """Marks beacons that timed out as missing. Returns the MAC addresses that went missing."""
+        if now is None:
+            now = time.time()
+        missing = []
+        for mac, state in self._states.items():
+            if state.present and now - state.last_seen > self.miss_timeout:
+                state.present = False
+                missing.append(mac)
+        return missing
+
+    def _recent_sightings(self, state, now):
+        since = now - self.window
+        return sum(1 for timestamp, _ in state.sightings if timestamp >= since)
+
+    def is_present(self, mac):
+        state = self._states.get(mac)
+        return state is not None and state.present
+
+    def is_missing(self, mac, now=None):
+        """
+        True if the beacon isn't present and has been tracked for at least a
+        window, so a newly added beacon gets the time to be found first.
+        """
+        if now is None:
+            now = time.time()
+        state = self._states.get(mac)
+        return state is not None and not state.present and now - state.tracked_since >= self.window
+
+    def present(self):
+        return [mac for mac, state in self._states.items() if state.present]
+
+    def last_rssi(self, mac):
+        return self._states[mac].last_rssi
+
+    def filtered_rssi(self, mac):
+        """Kalman-filtered RSSI of the beacon, or None if it was never seen."""
+        return self._states[mac].rssi_filter.value
+
+    def mean_rssi(self, mac, now=None):
+        """Mean RSSI of the advertisements within the window, or None."""
+        if now is None:
+            now = time.time()
+        since = now - self.window
+        values = [rssi for timestamp, rssi in self._states[mac].sightings if timestamp >= since]
+        return sum(values) / len(values) if values else None
+
+    def next_deadline(self):
+        """The earliest time at which a present beacon can time out, or None."""
+        deadlines = [state.last_seen + self.miss_timeout for state in self._states.values() if state.present]
+        return min(deadlines) if deadlines else None
@@ -0,0 +1,92 @@
+import asyncio
+import time
+from collections import deque
+
+
+class UltrasonicReader:
+    """
+    Incrementally parses the Arduino's "d1,d2,d3,d4" distance lines as they
+    arrive on the serial port.
+
+    Every frame is stored as timestamped samples in a fixed-size ring buffer
+    per sensor, so the detection logic sees every sample instead of only the
+    last line read every cycle. On Linux the port is watched with the event
+    loop's add_reader(); ports without a selectable file descriptor are
+    polled instead.
+    """
+
+    MAX_LINE_LENGTH = 256
+
+    def __init__(self, ser, sensor_count=4, history=64, on_frame=None, poll_interval=0.02):
+        self.ser = ser
+        self.sensor_count = sensor_count
+        self.on_frame = on_frame
+        self.poll_interval = poll_interval
+        self.samples = [deque(maxlen=history) for _ in range(sensor_count)]
+        self.invalid_lines = 0
+        self._buffer = bytearray()
+        self._loop = None
+        self._poll_task = None
+
+    def start(self):
+        self._loop = asyncio.get_running_loop()
+        self.ser.timeout = 0
+        try:
+            self._loop.add_reader(self.ser.fileno(), self._on_readable)
+        except (AttributeError, NotImplementedError, OSError, ValueError):
+            self._poll_task = asyncio.create_task(self._poll())
+
+    def stop(self):
+        if self._poll_task is not None:
+            self._poll_task.cancel()
+            self._poll_task = None
+        elif self._loop is not None:
+            self._loop.remove_reader(self.ser.fileno())
+        self._loop = None
+
+    async def _poll(self):
+        while True:
+            self._on_readable()
+            await asyncio.sleep(self.poll_interval)
+
+    def _on_readable(self):
+        try:
+            data = self.ser.read(self.ser.in_waiting or 1)
+        except Exception as e:
+            print(f"Error reading from Arduino: {e}")
+            return
+        if data:
+            self.feed(data)
+
+    def feed(self, data, now=None):
+        """Parses every complete line in data; a trailing partial line is kept for the next call."""
+        now = now or time.time()
+        self._buffer += data
+        *lines, rest = self._buffer.split(b'\n')
+        self._buffer = bytearray(rest[-self.MAX_LINE_LENGTH:])
+        for line in lines:
+            self._parse_line(line, now)
+
+    def _parse_line(self, line, now):
+        if not line.strip():
+            return
+        try:
+            distances = [float(d) for d in line.decode('utf-8').strip().split(',')]
+        except (UnicodeDecodeError, ValueError):
+            self.invalid_lines += 1
+            return
+        if len(distances) != self.sensor_count:
+            self.invalid_lines += 1
+            return
+        for samples, distance in zip(self.samples, distances):
+            samples.append((now, distance))
+        if self.on_frame is not None:
+            self.on_frame(now, distances)
+
+    def latest(self):
+        """The most recent distance of every sensor (0.0 until a frame has been read)."""
+        return [samples[-1][1] if samples else 0.0 for samples in self.samples]
+
+    def window(self, sensor_index, since):
+        """Distances read by one sensor at or after the given time, oldest first."""
+        return [distance for timestamp, distance in self.samples[sensor_index] if timestamp >= since]
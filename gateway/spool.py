@@ -0,0 +1,82 @@
+import json
+import sqlite3
+import time
+
+
+class Spool:
+    """
+    Durable, size-bounded outbox for data waiting to be sent to the server.
+
+    Records are appended to an SQLite database in WAL mode, so they survive
+    network outages and restarts of the gateway. When the spool holds more
+    than max_records, the oldest records are evicted first, except for those
+    of keep_kinds, which stay until they are acknowledged.
+    """
+
+    def __init__(self, path, max_records=100000, keep_kinds=()):
+        self.max_records = max_records
+        self.keep_kinds = tuple(keep_kinds)
+        self.evicted = 0
+        self._db = sqlite3.connect(path)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("PRAGMA synchronous=NORMAL")
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS spool ("
+            "id INTEGER PRIMARY KEY AUTOINCREMENT, "
+            "kind TEXT NOT NULL, "
+            "created_at REAL NOT NULL, "
+            "payload TEXT NOT NULL)"
+        )
+        self._db.execute("CREATE INDEX IF NOT EXISTS ix_spool_kind_id ON spool (kind, id)")
+        self._size = self.count()
+
+    def append(self, kind, payload):
+        with self._db:
+            self._db.execute(
+                "INSERT INTO spool (kind, created_at, payload) VALUES (?, ?, ?)",
+                (kind, time.time(), json.dumps(payload))
+            )
+            self._size += 1
+            overflow = self._size - self.max_records
+            if overflow > 0:
+                placeholders = ', '.join('?' * len(self.keep_kinds))
+                evicted = self._db.execute(
+                    "DELETE FROM spool WHERE id IN ("
+                    f"SELECT id FROM spool WHERE kind NOT IN ({placeholders}) ORDER BY id LIMIT ?)",
+                    (*self.keep_kinds, overflow)
+                ).rowcount
+                self._size -= evicted
+                self.evicted += evicted
+
+    def peek(self, kind, limit, after_id=0):
+        """Returns up to limit (id, payload) pairs of the given kind, oldest first."""
+        rows = self._db.execute(
+            "SELECT id, payload FROM spool WHERE kind = ? AND id > ? ORDER BY id LIMIT ?",
+            (kind, after_id, limit)
+        ).fetchall()
+        return [(record_id, json.loads(payload)) for record_id, payload in rows]
+
+    def ack(self, record_ids):
+        """Removes records that were delivered."""
+        with self._db:
+            self._size -= self._db.executemany(
+                "DELETE FROM spool WHERE id = ?", [(record_id,) for record_id in record_ids]
+            ).rowcount
+
+    def quarantine(self, record_ids):
+        """
+        Sets aside records that can't be delivered. They are no longer
+        returned by peek() and are evicted like any other overflow.
+        """
+        with self._db:
+            self._db.executemany(
+                "UPDATE spool SET kind = 'quarantine' WHERE id = ?", [(record_id,) for record_id in record_ids]
+            )
+
+    def count(self, kind=None):
+        if kind is None:
+            return self._db.execute("SELECT COUNT(*) FROM spool").fetchone()[0]
+        return self._db.execute("SELECT COUNT(*) FROM spool WHERE kind = ?", (kind,)).fetchone()[0]
+
+    def close(self):
+        self._db.close()
@@ -0,0 +1,188 @@
+import asyncio
+import gzip
+import json
+import random
+import time
+import aiohttp
+from gateway.spool import Spool
+
+
+class Uplink:
+    """
+    Sends sensor readings and stolen-status updates to the Flask server
+    without blocking the sensing loop.
+
+    Callers only append to a durable on-disk spool. A background task drains
+    the spool over a pool of keep-alive connections, posting readings to
+    /api/sensor_data/batch as gzip-compressed batches. If the server can't be
+    reached, everything stays spooled (up to the spool's size limit; status
+    updates are never evicted). Retries use exponential backoff with full
+    jitter, so many gateways coming back at the same time don't reconnect in
+    lockstep. Records the server keeps answering with a 5xx for are
+    quarantined after max_attempts, so they don't block the rest of the
+    spool.
+    """
+
+    def __init__(self, batch_url, status_url, spool_path='gateway_spool.db',
+                 max_spool_records=100000, batch_size=100, concurrency=4, timeout=5,
+                 min_backoff=1.0, max_backoff=60.0, max_attempts=8):
+        self.batch_url = batch_url
+        self.status_url = status_url
+        self.spool = Spool(spool_path, max_records=max_spool_records, keep_kinds=('status',))
+        self.batch_size = batch_size
+        self.concurrency = concurrency
+        self.timeout = timeout
+        self.min_backoff = min_backoff
+        self.max_backoff = max_backoff
+        self.max_attempts = max_attempts
+        # Last stolen status acknowledged by the server, and spooled updates
+        self._acknowledged_status = {}
+        self._pending_status = {}
+        self._failures = 0
+        # Server errors per spooled record id
+        self._attempts = {}
+        self._wakeup = None
+        self._session = None
+        self._worker = None
+
+    async def start(self):
+        self._wakeup = asyncio.Event()
+        self._session = aiohttp.ClientSession(
+            connector=aiohttp.TCPConnector(limit=self.concurrency, keepalive_timeout=60),
+            timeout=aiohttp.ClientTimeout(total=self.timeout)
+        )
+        self._worker = asyncio.create_task(self._drain())
+        if self.spool.count():
+            print(f"Resuming upload of {self.spool.count()} spooled records.")
+            self._wakeup.set()
+
+    async def close(self):
+        if self._worker is not None:
+            self._worker.cancel()
+            await asyncio.gather(self._worker, return_exceptions=True)
+            self._worker = None
+        if self._session is not None:
+            await self._session.close()
+            self._session = None
+        self.spool.close()
+
+    def send_reading(self, payload):
+        """Spools a reading for the next batch. Never waits for the network."""
+        self.spool.append('reading', payload)
+        self._wakeup.set()
+
+    def update_stolen_status(self, laptop_serial, is_stolen):
+        """Spools a stolen-status update unless the server already has, or is getting, this value."""
+        if self._pending_status.get(laptop_serial, self._acknowledged_status.get(laptop_serial)) == is_stolen:
+            return
+        self._pending_status[laptop_serial] = is_stolen
+        self.spool.append('status', {'serial_number': laptop_serial, 'is_stolen': is_stolen, 'observed_at': time.time()})
+        self._wakeup.set()
+
+    async def _drain(self):
+        while True:
+            await self._wakeup.wait()
+            self._wakeup.clear()
+            try:
+                while True:
+                    sent_statuses = await self._send_statuses()
+                    sent_readings = await self._send_readings()
+                    if not (sent_statuses or sent_readings):
+                        break
+                self._failures = 0
+            except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+                await self._back_off(f"Server unreachable ({e})")
+            except Exception as e:
+                # Keep draining; a dead worker would leave everything spooled
+                await self._back_off(f"Unexpected uplink error ({e!r})")
+
+    async def _back_off(self, reason):
+        self._failures += 1
+        delay = random.uniform(0, min(self.max_backoff, self.min_backoff * 2 ** min(self._failures, 16)))
+        print(f"{reason}, {self.spool.count()} records spooled. Retrying in {delay:.1f}s.")
+        await asyncio.sleep(delay)
+        self._wakeup.set()
+
+    def _server_error(self, records, response):
+        """
+        Counts a 5xx answer against each record and raises, so the records
+        are retried after a backoff. Once all of them have failed
+        max_attempts times, they are quarantined instead.
+        """
+        exhausted = []
+        for record_id, _ in records:
+            self._attempts[record_id] = self._attempts.get(record_id, 0) + 1
+            if self._attempts[record_id] >= self.max_attempts:
+                exhausted.append(record_id)
+        if len(exhausted) < len(records):
+            response.raise_for_status()
+        self.spool.quarantine(exhausted)
+        for record_id in exhausted:
+            del self._attempts[record_id]
+
+    def _ack(self, records):
+        self.spool.ack([record_id for record_id, _ in records])
+        for record_id, _ in records:
+            self._attempts.pop(record_id, None)
+
+    async def _post_batch(self, records):
+        body = gzip.compress(json.dumps({'readings': [payload for _, payload in records]}).encode('utf-8'))
+        headers = {'Content-Type': 'application/json', 'Content-Encoding': 'gzip'}
+        async with self._session.post(self.batch_url, data=body, headers=headers) as response:
+            if response.status >= 500:
+                self._server_error(records, response)
+                print(f"Server failed {len(records)} readings {self.max_attempts} times (HTTP {response.status}), "
+                      f"quarantined them.")
+                return
+            # A 4xx won't succeed on retry, so the batch is dropped
+            result = await response.json() if response.status < 400 else None
+        self._ack(records)
+        if result is None:
+            print(f"Server rejected {len(records)} readings (HTTP {response.status}), dropping them.")
+        else:
+            print(f"Sent {result['stored']}/{len(records)} readings successfully.")
+
+    async def _send_readings(self):
+        """Sends up to `concurrency` batches in parallel. Returns True if anything was sent."""
+        records = self.spool.peek('reading', self.batch_size * self.concurrency)
+        if not records:
+            return False
+        batches = [records[i:i + self.batch_size] for i in range(0, len(records), self.batch_size)]
+        results = await asyncio.gather(*(self._post_batch(batch) for batch in batches), return_exceptions=True)
+        for result in results:
+            if isinstance(result, Exception):
+                raise result
+        return True
+
+    async def _send_statuses(self):
+        """
+        Sends spooled status updates to /api/laptop_status/batch in one
+        request, oldest first. Returns True if anything was sent.
+        """
+        records = self.spool.peek('status', self.batch_size)
+        if not records:
+            return False
+        updates = [update for _, update in records]
+        async with self._session.post(f"{self.status_url}/batch", json={'transitions': updates}) as response:
+            if response.status >= 500:
+                self._server_error(records, response)
+                print(f"Server failed {len(updates)} status updates {self.max_attempts} times "
+                      f"(HTTP {response.status}), quarantined them.")
+                result = None
+            else:
+                # A 4xx won't succeed on retry, so the updates are dropped
+                result = await response.json() if response.status < 400 else None
+                self._ack(records)
+
+        outcomes = result['results'] if result is not None else [{'status': 'error'}] * len(updates)
+        for update, outcome in zip(updates, outcomes):
+            laptop_serial, is_stolen = update['serial_number'], update['is_stolen']
+            if self._pending_status.get(laptop_serial) == is_stolen:
+                del self._pending_status[laptop_serial]
+            if outcome['status'] == 'error':
+                print(f"Error updating laptop status for {laptop_serial}: {outcome.get('error', f'HTTP {response.status}')}")
+                continue
+            self._acknowledged_status[laptop_serial] = is_stolen
+        if result is not None:
+            print(f"Sent {len(updates)} status updates, {result['updated']} changed the database.")
+        return True
@@ -0,0 +1,43 @@
+"""Drop beacon identity columns from SensorReading
+
+The beacon's uuid/major/minor/MAC address were copied from the laptop into
+every reading. They are only kept on the laptop now.
+
+Revision ID: 0b7e4f2a9c15
+Revises: f1a6d3c8e907
+Create Date: 2025-08-19 11:22:48.604913
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '0b7e4f2a9c15'
+down_revision = 'f1a6d3c8e907'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table('sensor_reading', schema=None) as batch_op:
+        batch_op.drop_column('ibeacon_mac_address')
+        batch_op.drop_column('ibeacon_minor')
+        batch_op.drop_column('ibeacon_major')
+        batch_op.drop_column('ibeacon_uuid')
+
+
+def downgrade():
+    with op.batch_alter_table('sensor_reading', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('ibeacon_uuid', sa.String(length=36), nullable=True))
+        batch_op.add_column(sa.Column('ibeacon_major', sa.Integer(), nullable=True))
+        batch_op.add_column(sa.Column('ibeacon_minor', sa.Integer(), nullable=True))
+        batch_op.add_column(sa.Column('ibeacon_mac_address', sa.String(length=17), nullable=True))
+
+    op.execute(
+        "UPDATE sensor_reading SET "
+        "ibeacon_uuid = (SELECT l.ibeacon_uuid FROM laptop l WHERE l.id = sensor_reading.laptop_id), "
+        "ibeacon_major = (SELECT l.ibeacon_major FROM laptop l WHERE l.id = sensor_reading.laptop_id), "
+        "ibeacon_minor = (SELECT l.ibeacon_minor FROM laptop l WHERE l.id = sensor_reading.laptop_id), "
+        "ibeacon_mac_address = (SELECT l.ibeacon_mac_address FROM laptop l WHERE l.id = sensor_reading.laptop_id)"
+    )
@@ -0,0 +1,37 @@
+"""Make sensor_reading.timestamp NOT NULL outside PostgreSQL
+
+PostgreSQL already got the constraint when the table was partitioned
+(d81f0c3b6a2e); this brings the other databases in line with the model.
+
+Revision ID: 5c2a7e9d1f36
+Revises: 9d3f5b2e8a41
+Create Date: 2025-08-26 09:12:40.118305
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '5c2a7e9d1f36'
+down_revision = '9d3f5b2e8a41'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    if op.get_bind().dialect.name == 'postgresql':
+        return
+
+    # Same placeholder as the PostgreSQL migration uses for readings without a time
+    op.execute("UPDATE sensor_reading SET timestamp = '1970-01-01 00:00:00' WHERE timestamp IS NULL")
+    with op.batch_alter_table('sensor_reading', schema=None) as batch_op:
+        batch_op.alter_column('timestamp', existing_type=sa.DateTime(), nullable=False)
+
+
+def downgrade():
+    if op.get_bind().dialect.name == 'postgresql':
+        return
+
+    with op.batch_alter_table('sensor_reading', schema=None) as batch_op:
+        batch_op.alter_column('timestamp', existing_type=sa.DateTime(), nullable=True)
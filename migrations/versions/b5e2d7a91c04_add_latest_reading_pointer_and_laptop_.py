@@ -0,0 +1,48 @@
+"""Add latest reading pointer to Laptop and (laptop_id, timestamp) index
+
+Revision ID: b5e2d7a91c04
+Revises: 7c685ee7ccb7
+Create Date: 2025-08-09 10:12:41.208113
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'b5e2d7a91c04'
+down_revision = '7c685ee7ccb7'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table('laptop', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('last_reading_id', sa.Integer(), nullable=True))
+        batch_op.add_column(sa.Column('last_seen', sa.DateTime(), nullable=True))
+        batch_op.add_column(sa.Column('last_rssi', sa.Integer(), nullable=True))
+
+    with op.batch_alter_table('sensor_reading', schema=None) as batch_op:
+        batch_op.create_index('ix_sensor_reading_laptop_id_timestamp', ['laptop_id', 'timestamp'], unique=False)
+
+    # Backfill the pointer from existing readings (uses the new index)
+    op.execute(
+        "UPDATE laptop SET last_reading_id = ("
+        "SELECT sr.id FROM sensor_reading sr WHERE sr.laptop_id = laptop.id "
+        "ORDER BY sr.timestamp DESC, sr.id DESC LIMIT 1)"
+    )
+    op.execute(
+        "UPDATE laptop SET "
+        "last_seen = (SELECT sr.timestamp FROM sensor_reading sr WHERE sr.id = laptop.last_reading_id), "
+        "last_rssi = (SELECT sr.ibeacon_rssi FROM sensor_reading sr WHERE sr.id = laptop.last_reading_id)"
+    )
+
+
+def downgrade():
+    with op.batch_alter_table('sensor_reading', schema=None) as batch_op:
+        batch_op.drop_index('ix_sensor_reading_laptop_id_timestamp')
+
+    with op.batch_alter_table('laptop', schema=None) as batch_op:
+        batch_op.drop_column('last_rssi')
+        batch_op.drop_column('last_seen')
+        batch_op.drop_column('last_reading_id')
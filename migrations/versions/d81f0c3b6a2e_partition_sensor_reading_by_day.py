@@ -0,0 +1,81 @@
+"""Partition sensor_reading by day on PostgreSQL
+
+Revision ID: d81f0c3b6a2e
+Revises: b5e2d7a91c04
+Create Date: 2025-08-11 21:04:17.532190
+
+"""
+from datetime import datetime, timedelta
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'd81f0c3b6a2e'
+down_revision = 'b5e2d7a91c04'
+branch_labels = None
+depends_on = None
+
+PARTITIONS_AHEAD = 7
+
+
+def upgrade():
+    # Native partitioning is PostgreSQL only; other databases keep the plain
+    # table and rely on chunked deletes for retention (see app/retention.py).
+    if op.get_bind().dialect.name != 'postgresql':
+        return
+
+    tomorrow = datetime.utcnow().date() + timedelta(days=1)
+
+    # Keep the existing table as one partition holding everything before tomorrow
+    op.execute("ALTER TABLE sensor_reading RENAME TO sensor_reading_legacy")
+    op.execute("ALTER TABLE sensor_reading_legacy RENAME CONSTRAINT sensor_reading_pkey TO sensor_reading_legacy_pkey")
+    op.execute("ALTER INDEX ix_sensor_reading_timestamp RENAME TO ix_sensor_reading_legacy_timestamp")
+    op.execute("ALTER INDEX ix_sensor_reading_laptop_id_timestamp RENAME TO ix_sensor_reading_legacy_laptop_id_timestamp")
+    op.execute("UPDATE sensor_reading_legacy SET timestamp = '1970-01-01' WHERE timestamp IS NULL")
+    op.execute("ALTER TABLE sensor_reading_legacy ALTER COLUMN timestamp SET NOT NULL")
+    op.execute(
+        f"ALTER TABLE sensor_reading_legacy ADD CONSTRAINT sensor_reading_legacy_bound "
+        f"CHECK (timestamp < '{tomorrow:%Y-%m-%d}')"
+    )
+
+    op.execute(
+        "CREATE TABLE sensor_reading (LIKE sensor_reading_legacy INCLUDING DEFAULTS) "
+        "PARTITION BY RANGE (timestamp)"
+    )
+    op.execute("ALTER TABLE sensor_reading ADD CONSTRAINT sensor_reading_pkey PRIMARY KEY (id, timestamp)")
+    op.execute("ALTER TABLE sensor_reading ADD FOREIGN KEY (laptop_id) REFERENCES laptop (id)")
+    op.execute("ALTER SEQUENCE sensor_reading_id_seq OWNED BY sensor_reading.id")
+    op.create_index('ix_sensor_reading_timestamp', 'sensor_reading', ['timestamp'], unique=False)
+    op.create_index('ix_sensor_reading_laptop_id_timestamp', 'sensor_reading', ['laptop_id', 'timestamp'], unique=False)
+
+    op.execute(
+        f"ALTER TABLE sensor_reading ATTACH PARTITION sensor_reading_legacy "
+        f"FOR VALUES FROM (MINVALUE) TO ('{tomorrow:%Y-%m-%d}')"
+    )
+    op.execute("ALTER TABLE sensor_reading_legacy DROP CONSTRAINT sensor_reading_legacy_bound")
+
+    for offset in range(PARTITIONS_AHEAD):
+        day = tomorrow + timedelta(days=offset)
+        op.execute(
+            f"CREATE TABLE sensor_reading_p{day:%Y%m%d} PARTITION OF sensor_reading "
+            f"FOR VALUES FROM ('{day:%Y-%m-%d}') TO ('{day + timedelta(days=1):%Y-%m-%d}')"
+        )
+    # Catches readings outside the created range (e.g. gateways with a bad clock)
+    op.execute("CREATE TABLE sensor_reading_default PARTITION OF sensor_reading DEFAULT")
+
+
+def downgrade():
+    if op.get_bind().dialect.name != 'postgresql':
+        return
+
+    op.execute("CREATE TABLE sensor_reading_flat (LIKE sensor_reading INCLUDING DEFAULTS)")
+    op.execute("INSERT INTO sensor_reading_flat SELECT * FROM sensor_reading")
+    op.execute("ALTER SEQUENCE sensor_reading_id_seq OWNED BY sensor_reading_flat.id")
+    op.execute("DROP TABLE sensor_reading CASCADE")
+    op.execute("ALTER TABLE sensor_reading_flat RENAME TO sensor_reading")
+    op.execute("ALTER TABLE sensor_reading ALTER COLUMN timestamp DROP NOT NULL")
+    op.execute("ALTER TABLE sensor_reading ADD CONSTRAINT sensor_reading_pkey PRIMARY KEY (id)")
+    op.execute("ALTER TABLE sensor_reading ADD FOREIGN KEY (laptop_id) REFERENCES laptop (id)")
+    op.create_index('ix_sensor_reading_timestamp', 'sensor_reading', ['timestamp'], unique=False)
+    op.create_index('ix_sensor_reading_laptop_id_timestamp', 'sensor_reading', ['laptop_id', 'timestamp'], unique=False)
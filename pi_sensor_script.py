@@ -1,28 +1,60 @@
 import asyncio
 import time
-import requests
 import json
 import RPi.GPIO as GPIO
 import serial
 from bleak import BleakScanner
+from gateway.uplink import Uplink
+from gateway.serial_reader import UltrasonicReader
+from gateway.presence import PresenceTracker
+from gateway.assignment import AssignmentClient
+from sensing.rssi import estimate_distance
 
 # --- CONFIGURATION ---
-FLASK_DATA_API_URL = "http://192.168.100.36:5000/api/sensor_data"
+FLASK_BATCH_DATA_API_URL = "http://192.168.100.36:5000/api/sensor_data/batch"
 FLASK_STATUS_API_URL = "http://192.168.100.36:5000/api/laptop_status"
 
-IBEACON_TO_LAPTOP_MAP = {
-    "D7:6F:22:D8:59:C9": "00032072025",
-    "C0:2F:AE:A5:B9:45": "00001082025",
-}
-
-# --- ULTRASONIC SENSOR MAPPING ---
-ULTRASONIC_SENSOR_TO_LAPTOP_MAP = {
-    "00032072025": 0,
-    "00001082025": 1,
-}
-
-# --- ALARM THRESHOLD ---
-MIN_DISTANCE_CM = 5.0
+# Readings and status updates wait here while the server is unreachable
+SPOOL_PATH = 'gateway_spool.db'
+
+# --- GATEWAY ASSIGNMENT ---
+# The laptops this gateway monitors, their beacons, ultrasonic sensors and
+# distance thresholds are assigned on the server (flask gateways assign).
+# The assignment is polled every ASSIGNMENT_POLL_INTERVAL_S seconds and
+# applied without a restart; the last one is cached at ASSIGNMENT_CACHE_PATH
+# so the gateway can start while the server is unreachable.
+GATEWAY_NAME = "gateway-1"
+FLASK_ASSIGNMENT_API_URL = f"http://192.168.100.36:5000/api/gateways/{GATEWAY_NAME}/assignment"
+ASSIGNMENT_CACHE_PATH = 'gateway_assignment.json'
+ASSIGNMENT_POLL_INTERVAL_S = 30.0
+
+# --- SENSING CADENCE ---
+# The alarm is evaluated as soon as a beacon advertisement or a distance
+# frame arrives. Distances are checked over the last DISTANCE_WINDOW_S seconds.
+DISTANCE_WINDOW_S = 2.0
+
+# --- BEACON PRESENCE ---
+# A beacon is reported missing after MISS_TOLERANCE consecutive advertisements
+# (sent every ADVERTISING_INTERVAL_S seconds) were missed. A missing beacon is
+# present again after PRESENT_AFTER_SIGHTINGS advertisements within
+# PRESENCE_WINDOW_S seconds.
+ADVERTISING_INTERVAL_S = 1.0
+MISS_TOLERANCE = 3
+PRESENT_AFTER_SIGHTINGS = 2
+PRESENCE_WINDOW_S = 6.0
+
+# --- DISTANCE ESTIMATION ---
+# Readings of beacons with a measured power in the assignment carry a
+# distance estimate; the server estimates the others from the laptop's
+# calibration.
+PATH_LOSS_EXPONENT = 2.5
+
+# --- UPLINK CADENCE ---
+# Readings are reported every UPLINK_STABLE_INTERVAL_S seconds while all
+# laptops are safe, and every UPLINK_INCIDENT_INTERVAL_S seconds while any
+# laptop is in danger.
+UPLINK_STABLE_INTERVAL_S = 30.0
+UPLINK_INCIDENT_INTERVAL_S = 1.0
 
 # Arduino Serial Port Configuration
 SERIAL_PORT = '/dev/ttyUSB0'
@@ -34,7 +66,11 @@ GPIO.setmode(GPIO.BCM)
 GPIO.setup(BUZZER_PIN, GPIO.OUT)
 
 alarm_task = None
-stolen_laptops_status = {serial: False for serial in IBEACON_TO_LAPTOP_MAP.values()}
+uplink = Uplink(
+    FLASK_BATCH_DATA_API_URL,
+    FLASK_STATUS_API_URL,
+    spool_path=SPOOL_PATH
+)
 
 async def beeping_alarm():
     try:
@@ -52,117 +88,146 @@ async def beeping_alarm():
         GPIO.output(BUZZER_PIN, GPIO.LOW)
         print("Beeping alarm stopped.")
 
-def update_stolen_status(laptop_serial, is_stolen):
-    global stolen_laptops_status
-    if stolen_laptops_status.get(laptop_serial) != is_stolen:
-        url = f"{FLASK_STATUS_API_URL}/{laptop_serial}"
-        payload = {"is_stolen": is_stolen}
-        try:
-            response = requests.post(url, json=payload, timeout=5)
-            response.raise_for_status()
-            stolen_laptops_status[laptop_serial] = is_stolen
-            print(f"Laptop {laptop_serial} status updated to is_stolen={is_stolen} in the database.")
-        except requests.exceptions.RequestException as e:
-            print(f"Error updating laptop status for {laptop_serial}: {e}")
-
-def get_ultrasonic_distances(ser):
-    last_valid_distances = [0.0, 0.0, 0.0, 0.0]
-    try:
-        while ser.in_waiting > 0:
-            line = ser.readline().decode('utf-8').strip()
-            if line:
-                try:
-                    distances = [float(d) for d in line.split(',')]
-                    if len(distances) == 4:
-                        print(f"Read distances from Arduino: {distances} cm")
-                        last_valid_distances = distances
-                except ValueError:
-                    pass
-        return last_valid_distances
-    except Exception as e:
-        print(f"Error reading from Arduino: {e}")
-        return last_valid_distances
-
 # --- SCANNING AND DATA SENDING LOGIC ---
 async def scan_and_send_data():
     global alarm_task
     print("Starting iBeacon scanner...")
 
-    found_devices = {}
+    presence = PresenceTracker(
+        (),
+        window=PRESENCE_WINDOW_S,
+        advertising_interval=ADVERTISING_INTERVAL_S,
+        miss_tolerance=MISS_TOLERANCE,
+        present_after=PRESENT_AFTER_SIGHTINGS
+    )
+    laptops_in_danger = set()
+    sensor_event = asyncio.Event()
+    report_now = asyncio.Event()
+
+    def apply_assignment(assignment):
+        presence.set_macs(assignment.macs)
+        sensor_event.set()
+
+    assignments = AssignmentClient(
+        FLASK_ASSIGNMENT_API_URL,
+        cache_path=ASSIGNMENT_CACHE_PATH,
+        poll_interval=ASSIGNMENT_POLL_INTERVAL_S,
+        on_change=apply_assignment
+    )
 
     def detection_callback(device, advertisement_data):
-        if device.address in IBEACON_TO_LAPTOP_MAP:
+        if device.address in assignments.current.laptops_by_mac:
             rssi = advertisement_data.rssi
-            found_devices[device.address] = {
-                "rssi": rssi
-            }
+            presence.observe(device.address, rssi)
             print(f"Found target iBeacon ({device.address}) with RSSI: {rssi}")
+            sensor_event.set()
+
+    def evaluate_alarm():
+        global alarm_task
+        now = time.time()
+        in_danger = set()
+        laptops = assignments.current.laptops
+
+        presence.update(now)
+        for laptop in laptops:
+            if presence.is_missing(laptop.mac_address, now):
+                in_danger.add(laptop.serial_number)
+
+        for laptop in laptops:
+            if laptop.sensor_index is None or not 0 <= laptop.sensor_index < ultrasonic.sensor_count:
+                continue
+            # Every distance within the distance window, so short movements aren't missed
+            for distance in ultrasonic.window(laptop.sensor_index, now - DISTANCE_WINDOW_S):
+                if laptop.distance_out_of_range(distance):
+                    if laptop.serial_number not in laptops_in_danger:
+                        print(f"Laptop {laptop.serial_number} moved! Distance is {distance} cm")
+                    in_danger.add(laptop.serial_number)
+                    break
+
+        if in_danger:
+            if not alarm_task:
+                alarm_task = asyncio.create_task(beeping_alarm())
+                print(f"ALARM ACTIVATED! The following laptops are in danger: {', '.join(in_danger)}")
+        elif alarm_task:
+            alarm_task.cancel()
+            alarm_task = None
+            print("All beacons found. Alarm deactivated.")
 
-    scanner = BleakScanner(detection_callback)
-    await scanner.start()
+        # Status updates are only queued when they change
+        for laptop in laptops:
+            uplink.update_stolen_status(laptop.serial_number, laptop.serial_number in in_danger)
 
-    ser = serial.Serial(SERIAL_PORT, SERIAL_BAUDRATE, timeout=1)
-    ser.flushInput()
+        if in_danger != laptops_in_danger:
+            laptops_in_danger.clear()
+            laptops_in_danger.update(in_danger)
+            report_now.set()
 
-    try:
+    async def evaluate_on_events():
         while True:
-            await asyncio.sleep(2)
-            ultrasonic_distances = get_ultrasonic_distances(ser)
-
-            found_mac_addresses = found_devices.keys()
-            all_target_macs = IBEACON_TO_LAPTOP_MAP.keys()
-
-            missing_beacons = [mac for mac in all_target_macs if mac not in found_mac_addresses]
-
-            if missing_beacons:
-                if not alarm_task:
-                    alarm_task = asyncio.create_task(beeping_alarm())
-                    print(f"ALARM ACTIVATED! The following beacons are missing: {', '.join(missing_beacons)}")
-                for mac in missing_beacons:
-                    laptop_serial = IBEACON_TO_LAPTOP_MAP.get(mac)
-                    if laptop_serial:
-                        update_stolen_status(laptop_serial, True)
-            else:
-                if alarm_task:
-                    alarm_task.cancel()
-                    alarm_task = None
-                    print("All beacons found. Alarm deactivated.")
-
-            for mac_address, beacon_data in found_devices.items():
-                laptop_serial = IBEACON_TO_LAPTOP_MAP.get(mac_address)
-
-                if laptop_serial:
-                    # --- Check distance ---
-                    sensor_index = ULTRASONIC_SENSOR_TO_LAPTOP_MAP.get(laptop_serial)
-                    if sensor_index is not None:
-                        distance = ultrasonic_distances[sensor_index]
-                        print(f"Distance for {laptop_serial}: {distance} cm")
-
-                        if distance > MIN_DISTANCE_CM:
-                            print(f"Laptop {laptop_serial} moved! Distance is {distance} cm")
-                            if not alarm_task:
-                                alarm_task = asyncio.create_task(beeping_alarm())
-                            update_stolen_status(laptop_serial, True)
-                            continue  # Skip sending normal data
-
-                    # --- All good, laptop is present and close ---
-                    update_stolen_status(laptop_serial, False)
+            # Re-evaluate on every BLE or serial event, and at the latest when a
+            # present beacon is about to time out
+            timeout = PRESENCE_WINDOW_S
+            deadline = presence.next_deadline()
+            if deadline is not None:
+                timeout = max(0.1, deadline - time.time())
+            try:
+                await asyncio.wait_for(sensor_event.wait(), timeout)
+            except asyncio.TimeoutError:
+                pass
+            sensor_event.clear()
+            evaluate_alarm()
 
+    async def report_readings():
+        while True:
+            interval = UPLINK_INCIDENT_INTERVAL_S if laptops_in_danger else UPLINK_STABLE_INTERVAL_S
+            try:
+                await asyncio.wait_for(report_now.wait(), interval)
+            except asyncio.TimeoutError:
+                pass
+            report_now.clear()
+
+            now = time.time()
+            ultrasonic_distances = ultrasonic.latest()
+            laptops_by_mac = assignments.current.laptops_by_mac
+            for mac_address in presence.present():
+                laptop = laptops_by_mac.get(mac_address)
+
+                # Readings of laptops that moved are not sent as normal data
+                if laptop and laptop.serial_number not in laptops_in_danger:
                     payload = {
-                        "serial_number": laptop_serial,
-                        "ibeacon_rssi": beacon_data['rssi'],
-                        "ultrasonic_distances": ultrasonic_distances
+                        "serial_number": laptop.serial_number,
+                        "ibeacon_rssi": presence.last_rssi(mac_address),
+                        "ibeacon_rssi_filtered": presence.filtered_rssi(mac_address),
+                        "ultrasonic_distances": ultrasonic_distances,
+                        "timestamp": now
                     }
 
-                    # --- ADD THIS MISSING CODE TO SEND THE DATA ---
-                    try:
-                        response = requests.post(FLASK_DATA_API_URL, json=payload, timeout=5)
-                        response.raise_for_status()
-                        print(f"Sent data for {laptop_serial} successfully.")
-                    except requests.exceptions.RequestException as e:
-                        print(f"Error sending data for {laptop_serial}: {e}")
+                    if laptop.ibeacon_tx_power is not None:
+                        payload["estimated_distance_m"] = estimate_distance(
+                            payload["ibeacon_rssi_filtered"], laptop.ibeacon_tx_power, PATH_LOSS_EXPONENT
+                        )
 
-            found_devices.clear()
+                    # Queued; the uplink sends it in the background
+                    uplink.send_reading(payload)
+
+    # Starts with the cached assignment, or waits for the server to provide one
+    await assignments.start()
+    apply_assignment(assignments.current)
+
+    scanner = BleakScanner(detection_callback)
+    await scanner.start()
+    await uplink.start()
+
+    ser = serial.Serial(SERIAL_PORT, SERIAL_BAUDRATE, timeout=1)
+    ser.flushInput()
+    ultrasonic = UltrasonicReader(ser, on_frame=lambda timestamp, distances: sensor_event.set())
+    ultrasonic.start()
+
+    try:
+        # Give the scanner one presence window to find the beacons before
+        # missing ones raise the alarm
+        await asyncio.sleep(PRESENCE_WINDOW_S)
+        await asyncio.gather(evaluate_on_events(), report_readings())
 
     except asyncio.CancelledError:
         print("Scanner stopped.")
@@ -174,6 +239,9 @@ async def scan_and_send_data():
             except asyncio.CancelledError:
                 pass
         await scanner.stop()
+        await uplink.close()
+        await assignments.close()
+        ultrasonic.stop()
         ser.close()
         GPIO.cleanup()
 
@@ -0,0 +1 @@
+"""Signal processing shared by the Raspberry Pi gateway and the Flask server."""
@@ -0,0 +1,56 @@
+"""
+iBeacon advertisement parsing.
+
+Scanner callbacks see every BLE advertisement in range, and most Apple
+advertisements (iPhones, AirPods, AirTags) aren't iBeacons. The parser
+rejects those on the length and prefix before decoding anything, and
+decodes iBeacon frames with a single struct call.
+"""
+import struct
+
+# Apple's manufacturer ID; iBeacon data starts with bytes [0x02, 0x15]
+APPLE_COMPANY_ID = 0x004c
+IBEACON_PREFIX = b'\x02\x15'
+
+# UUID, major, minor and measured power (signed RSSI at 1 m), after the prefix
+_FRAME = struct.Struct('>16sHHb')
+IBEACON_LENGTH = len(IBEACON_PREFIX) + _FRAME.size
+
+
+class IBeacon:
+    __slots__ = ('uuid', 'major', 'minor', 'measured_power')
+
+    def __init__(self, uuid, major, minor, measured_power):
+        # 32 lowercase hex digits, the format the server stores
+        self.uuid = uuid
+        self.major = major
+        self.minor = minor
+        self.measured_power = measured_power
+
+    def __repr__(self):
+        return f'IBeacon(uuid={self.uuid!r}, major={self.major}, minor={self.minor}, measured_power={self.measured_power})'
+
+
+def uuid_whitelist(uuids):
+    """
+    Converts UUID strings (with or without dashes, any case) to the set
+    parse_ibeacon filters with. Returns None for an empty iterable,
+    which accepts every UUID.
+    """
+    whitelist = frozenset(bytes.fromhex(uuid.replace('-', '')) for uuid in uuids if uuid)
+    return whitelist or None
+
+
+def parse_ibeacon(advertisement_data, uuids=None):
+    """
+    Decodes a bleak AdvertisementData into an IBeacon, or returns None if it
+    isn't an iBeacon advertisement. If uuids (see uuid_whitelist) is given,
+    iBeacons with other UUIDs are rejected as well.
+    """
+    data = advertisement_data.manufacturer_data.get(APPLE_COMPANY_ID)
+    if data is None or len(data) < IBEACON_LENGTH or not data.startswith(IBEACON_PREFIX):
+        return None
+    uuid, major, minor, measured_power = _FRAME.unpack_from(data, 2)
+    if uuids is not None and uuid not in uuids:
+        return None
+    return IBeacon(uuid.hex(), major, minor, measured_power)
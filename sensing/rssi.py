@@ -0,0 +1,64 @@
+import math
+
+# Measured power (RSSI at 1 m) advertised by most iBeacons when not calibrated
+DEFAULT_TX_POWER = -59
+# 2.0 in free space; typically 2.5 - 4.0 indoors
+DEFAULT_PATH_LOSS_EXPONENT = 2.5
+# Range of RSSI values a BLE radio can report, in dBm
+MIN_RSSI = -127
+MAX_RSSI = 20
+
+
+class RssiFilter:
+    """
+    One-dimensional Kalman filter for the RSSI of a single beacon.
+
+    RSSI is modelled as a constant disturbed by measurement noise. The process
+    noise grows with the time between samples, so a beacon that was silent
+    for a while follows its next samples faster than one that is advertising
+    steadily.
+    """
+
+    __slots__ = ('process_noise', 'measurement_noise', 'value', 'variance', 'last_timestamp')
+
+    def __init__(self, process_noise=0.5, measurement_noise=4.0):
+        self.process_noise = process_noise
+        self.measurement_noise = measurement_noise
+        self.value = None
+        self.variance = None
+        self.last_timestamp = None
+
+    def update(self, rssi, timestamp=None):
+        """Adds a sample and returns the filtered RSSI."""
+        if self.value is None:
+            self.value = float(rssi)
+            self.variance = self.measurement_noise
+        else:
+            elapsed = 1.0
+            if timestamp is not None and self.last_timestamp is not None:
+                elapsed = max(timestamp - self.last_timestamp, 0.0)
+            variance = self.variance + self.process_noise * elapsed
+            gain = variance / (variance + self.measurement_noise)
+            self.value += gain * (rssi - self.value)
+            self.variance = (1 - gain) * variance
+        if timestamp is not None:
+            self.last_timestamp = timestamp
+        return self.value
+
+
+def filter_series(samples, rssi_filter=None):
+    """
+    Filters a sequence of (timestamp, rssi) samples of one beacon, oldest
+    first. Returns the filtered RSSI of every sample.
+    """
+    rssi_filter = rssi_filter or RssiFilter()
+    return [rssi_filter.update(rssi, timestamp) for timestamp, rssi in samples]
+
+
+def estimate_distance(rssi, tx_power=None, path_loss_exponent=DEFAULT_PATH_LOSS_EXPONENT):
+    """Distance in metres from the log-distance path-loss model."""
+    if rssi is None:
+        return None
+    if tx_power is None:
+        tx_power = DEFAULT_TX_POWER
+    return math.pow(10, (tx_power - rssi) / (10 * path_loss_exponent))
@@ -0,0 +1,11 @@
+def distance_out_of_range(distance, min_distance_cm, max_distance_cm):
+    """
+    True if an ultrasonic distance in cm lies outside [min_distance_cm,
+    max_distance_cm]; None for either bound leaves that side open. None or 0
+    means the sensor got no echo, which is never out of range.
+    """
+    if distance is None or distance <= 0:
+        return False
+    if min_distance_cm is not None and distance < min_distance_cm:
+        return True
+    return max_distance_cm is not None and distance > max_distance_cm
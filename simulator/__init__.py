@@ -0,0 +1,6 @@
+"""
+Offline load simulator: replays recorded or synthetic beacon and
+ultrasonic traffic through the unmodified Pi gateway scripts, using fake
+bleak, serial and RPi.GPIO modules, against the Flask app. Run it with
+`python -m simulator`.
+"""
@@ -0,0 +1,91 @@
+"""
+Load test of the server and the gateway scripts without hardware:
+
+    python -m simulator --gateways 20 --laptops-per-gateway 100 --duration 120 --thefts 40
+
+See README.md (Simulator) for the options.
+"""
+import argparse
+import json
+import os
+import sys
+import tempfile
+
+# Before anything imports bleak, serial or RPi.GPIO
+from simulator import fakes
+fakes.install()
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(prog='python -m simulator', description='Replay gateway traffic against the Flask app.')
+    fleet = parser.add_argument_group('fleet and trace')
+    fleet.add_argument('--gateways', type=int, default=10)
+    fleet.add_argument('--laptops-per-gateway', type=int, default=50)
+    fleet.add_argument('--duration', type=float, default=60.0, help='Seconds of traffic to replay.')
+    fleet.add_argument('--thefts', type=int, default=10, help='Laptops stolen during the run.')
+    fleet.add_argument('--warmup', type=float, default=15.0, help='Seconds before the first theft.')
+    fleet.add_argument('--advertising-interval', type=float, default=1.0)
+    fleet.add_argument('--serial-interval', type=float, default=0.1, help='Seconds between Arduino lines.')
+    fleet.add_argument('--loss', type=float, default=0.05, help='Fraction of advertisements lost.')
+    fleet.add_argument('--seed', type=int, default=0)
+    fleet.add_argument('--trace', help='Replay this trace instead of generating one.')
+    fleet.add_argument('--save-trace', metavar='PATH', help='Write the generated trace to PATH and exit.')
+
+    run = parser.add_argument_group('run')
+    run.add_argument('--database-url', help='Defaults to a fresh SQLite file in the work directory.')
+    run.add_argument('--reset', action='store_true', help='Drop and recreate all tables first. Destroys the database contents.')
+    run.add_argument('--script', default='pi_script_new', help='Gateway script to simulate (module name or path).')
+    run.add_argument('--report-interval', type=float, default=5.0, help='UPLINK_STABLE_INTERVAL_S of the gateways.')
+    run.add_argument('--speed', type=float, default=1.0, help='Replay speed factor.')
+    run.add_argument('--posters', type=int, default=4, help='Threads posting single readings to /api/sensor_data.')
+    run.add_argument('--post-rate', type=float, default=20.0, help='Single readings per second, in total.')
+    run.add_argument('--pollers', type=int, default=4, help='Threads polling /api/laptop_status/<id>.')
+    run.add_argument('--poll-rate', type=float, default=20.0, help='Status polls per second, in total.')
+    run.add_argument('--port', type=int, default=None)
+    run.add_argument('--workdir', help='Keep spools, assignment caches and the SQLite database here.')
+    run.add_argument('--json', metavar='PATH', help='Also write the results as JSON.')
+    run.add_argument('--verbose', action='store_true', help="Show the gateways' output.")
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    from simulator.traces import load_trace, save_trace, schedule_thefts, synthetic_fleet, synthetic_trace
+
+    if args.trace:
+        fleet, events = load_trace(args.trace)
+    else:
+        fleet = synthetic_fleet(args.gateways, args.laptops_per_gateway)
+        thefts = schedule_thefts(fleet, args.thefts, args.warmup, max(args.warmup, args.duration - 10), seed=args.seed)
+        events = synthetic_trace(
+            fleet, args.duration, thefts, advertising_interval=args.advertising_interval,
+            serial_interval=args.serial_interval, loss=args.loss, seed=args.seed
+        )
+    if args.save_trace:
+        count = save_trace(args.save_trace, fleet, events)
+        print(f"Wrote {count} events for {len(fleet)} laptops to {args.save_trace}.")
+        return
+
+    with tempfile.TemporaryDirectory(prefix='simulator-') as temporary:
+        workdir = os.path.abspath(args.workdir or temporary)
+        os.makedirs(workdir, exist_ok=True)
+        database_url = args.database_url or f"sqlite:///{os.path.join(workdir, 'simulator.db')}"
+        # Read by config.py when the app is imported, here and in the server process
+        os.environ['DATABASE_URL'] = database_url
+
+        from simulator.report import format_report
+        from simulator.run import simulate
+        result = simulate(
+            fleet, events, args.duration, workdir, database_url, script=args.script, reset=args.reset,
+            report_interval=args.report_interval, speed=args.speed, posters=args.posters,
+            post_rate=args.post_rate, pollers=args.pollers, poll_rate=args.poll_rate,
+            port=args.port, verbose=args.verbose
+        )
+    print(format_report(result))
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump(result, f, indent=2)
+
+
+if __name__ == '__main__':
+    sys.exit(main())
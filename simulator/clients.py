@@ -0,0 +1,80 @@
+"""
+HTTP clients that load the server next to the gateways: devices posting
+single readings to /api/sensor_data, and dashboards polling laptop status.
+"""
+import json
+import random
+import threading
+import time
+import urllib.error
+import urllib.request
+
+
+class ClientPool:
+    """
+    Threads that each run request() at a fixed rate until stopped. Failed
+    requests are counted, not retried.
+    """
+
+    def __init__(self, name, threads, rate, request):
+        self.name = name
+        self.rate = rate
+        self.request = request
+        self.sent = 0
+        self.failed = 0
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._threads = [
+            threading.Thread(target=self._run, args=(threads,), name=f'{name}-{i}', daemon=True)
+            for i in range(threads)
+        ]
+
+    def _run(self, threads):
+        interval = threads / self.rate
+        # Spread the threads' first requests over one interval
+        next_at = time.monotonic() + random.uniform(0, interval)
+        while not self._stop.wait(max(0.0, next_at - time.monotonic())):
+            try:
+                self.request()
+                ok = True
+            except (urllib.error.URLError, OSError):
+                ok = False
+            with self._lock:
+                self.sent += 1
+                self.failed += not ok
+            next_at = max(next_at + interval, time.monotonic() - interval)
+
+    def start(self):
+        for thread in self._threads:
+            thread.start()
+
+    def stop(self):
+        self._stop.set()
+        for thread in self._threads:
+            thread.join()
+
+
+def _request(url, payload=None, timeout=10):
+    data = json.dumps(payload).encode('utf-8') if payload is not None else None
+    headers = {'Content-Type': 'application/json'} if data is not None else {}
+    with urllib.request.urlopen(urllib.request.Request(url, data=data, headers=headers), timeout=timeout) as response:
+        return response.read()
+
+
+def reading_posters(server_url, serial_numbers, threads, rate):
+    """Devices that send one reading per request to /api/sensor_data."""
+    def post_reading():
+        _request(f'{server_url}/api/sensor_data', {
+            'serial_number': random.choice(serial_numbers),
+            'ibeacon_rssi': random.randint(-75, -55),
+            'ultrasonic_distances': [round(random.uniform(15, 40), 1) for _ in range(4)],
+            'timestamp': time.time(),
+        })
+    return ClientPool('sensor-data', threads, rate, post_reading)
+
+
+def status_pollers(server_url, laptop_ids, threads, rate):
+    """Dashboards polling /api/laptop_status/<id>."""
+    def poll_status():
+        _request(f'{server_url}/api/laptop_status/{random.choice(laptop_ids)}')
+    return ClientPool('status', threads, rate, poll_status)
@@ -0,0 +1,152 @@
+"""
+Stand-ins for the gateway's hardware libraries (bleak, pyserial and
+RPi.GPIO), so the Pi scripts run unmodified on any Linux machine.
+"""
+import fcntl
+import os
+import struct
+import sys
+import termios
+import types
+
+APPLE_COMPANY_ID = 0x004c
+
+
+class FakeGPIO(types.ModuleType):
+    """RPi.GPIO that only remembers the last value written to each pin."""
+
+    BCM = 11
+    BOARD = 10
+    OUT = 0
+    IN = 1
+    LOW = 0
+    HIGH = 1
+
+    def __init__(self):
+        super().__init__('RPi.GPIO')
+        self.pins = {}
+
+    def setmode(self, mode):
+        pass
+
+    def setwarnings(self, flag):
+        pass
+
+    def setup(self, pin, mode):
+        self.pins.setdefault(pin, self.LOW)
+
+    def output(self, pin, value):
+        self.pins[pin] = value
+
+    def cleanup(self):
+        self.pins.clear()
+
+
+class SerialException(Exception):
+    pass
+
+
+class FakeSerial:
+    """
+    A serial port backed by a pipe. The simulator writes the Arduino's
+    distance lines into it, and the gateway reads them through a real file
+    descriptor, so UltrasonicReader's add_reader() path is exercised.
+    """
+
+    def __init__(self, port=None, baudrate=9600, timeout=None):
+        self.port = port
+        self.baudrate = baudrate
+        self.timeout = timeout
+        self.overruns = 0
+        self._read_fd, self._write_fd = os.pipe()
+        os.set_blocking(self._read_fd, False)
+        os.set_blocking(self._write_fd, False)
+
+    def fileno(self):
+        return self._read_fd
+
+    @property
+    def in_waiting(self):
+        return struct.unpack('i', fcntl.ioctl(self._read_fd, termios.FIONREAD, b'\0\0\0\0'))[0]
+
+    def read(self, size=1):
+        try:
+            return os.read(self._read_fd, size)
+        except BlockingIOError:
+            return b''
+
+    def flushInput(self):
+        while self.read(4096):
+            pass
+
+    reset_input_buffer = flushInput
+
+    def write_line(self, distances):
+        """Sends a "d1,d2,d3,d4" line as the Arduino would. Lines are dropped while the reader lags behind."""
+        try:
+            os.write(self._write_fd, (','.join(f'{d:.1f}' for d in distances) + '\n').encode('ascii'))
+        except BlockingIOError:
+            self.overruns += 1
+
+    def close(self):
+        for fd in (self._read_fd, self._write_fd):
+            try:
+                os.close(fd)
+            except OSError:
+                pass
+
+
+class FakeDevice:
+    __slots__ = ('address', 'name')
+
+    def __init__(self, address, name=None):
+        self.address = address
+        self.name = name
+
+
+class FakeAdvertisementData:
+    __slots__ = ('rssi', 'manufacturer_data')
+
+    def __init__(self, rssi, manufacturer_data):
+        self.rssi = rssi
+        self.manufacturer_data = manufacturer_data
+
+
+class FakeBleakScanner:
+    """BleakScanner whose advertisements come from advertise() instead of the radio."""
+
+    def __init__(self, detection_callback=None, **kwargs):
+        self.detection_callback = detection_callback
+        self.scanning = False
+
+    async def start(self):
+        self.scanning = True
+
+    async def stop(self):
+        self.scanning = False
+
+    def advertise(self, device, advertisement_data):
+        if self.scanning and self.detection_callback is not None:
+            self.detection_callback(device, advertisement_data)
+
+
+def ibeacon_frame(uuid, major, minor, measured_power=-59):
+    """Apple manufacturer data of an iBeacon advertisement."""
+    return b'\x02\x15' + bytes.fromhex(uuid) + struct.pack('>HHb', major, minor, measured_power)
+
+
+def install():
+    """
+    Registers the fakes as the bleak, serial and RPi.GPIO modules. Call it
+    before anything imports them. Returns the fake GPIO module.
+    """
+    gpio = FakeGPIO()
+    rpi = types.ModuleType('RPi')
+    rpi.GPIO = gpio
+    bleak = types.ModuleType('bleak')
+    bleak.BleakScanner = FakeBleakScanner
+    serial = types.ModuleType('serial')
+    serial.Serial = FakeSerial
+    serial.SerialException = SerialException
+    sys.modules.update({'RPi': rpi, 'RPi.GPIO': gpio, 'bleak': bleak, 'serial': serial})
+    return gpio
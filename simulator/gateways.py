@@ -0,0 +1,88 @@
+"""
+Virtual gateways: independent copies of a Pi script, each wired to its own
+fake BLE scanner and serial port.
+"""
+import contextlib
+import importlib.util
+import os
+import time
+import types
+from gateway.uplink import Uplink
+from simulator.fakes import FakeBleakScanner, FakeSerial, SerialException
+
+
+def _quiet(*args, **kwargs):
+    pass
+
+
+@contextlib.contextmanager
+def _working_directory(path):
+    previous = os.getcwd()
+    os.chdir(path)
+    try:
+        yield
+    finally:
+        os.chdir(previous)
+
+
+class VirtualGateway:
+    """
+    Loads the Pi script as a fresh module, so every gateway has its own
+    globals (uplink, alarm task), and points it at the simulated server.
+    Alarm times are recorded when the script queues a stolen status.
+    """
+
+    def __init__(self, name, script_path, server_url, workdir, report_interval=None, verbose=False):
+        self.name = name
+        self.scanner = None
+        self.serial = None
+        self.alarms = {}
+
+        # The script creates its uplink (and spool file) at import time
+        spec = importlib.util.spec_from_file_location(f'simulated_gateway_{name.replace("-", "_")}', script_path)
+        module = importlib.util.module_from_spec(spec)
+        with _working_directory(workdir):
+            spec.loader.exec_module(module)
+        module.uplink.spool.close()
+
+        module.GATEWAY_NAME = name
+        module.FLASK_ASSIGNMENT_API_URL = f'{server_url}/api/gateways/{name}/assignment'
+        module.ASSIGNMENT_CACHE_PATH = os.path.join(workdir, f'{name}-assignment.json')
+        module.SPOOL_PATH = os.path.join(workdir, f'{name}-spool.db')
+        if report_interval is not None:
+            module.UPLINK_STABLE_INTERVAL_S = report_interval
+        module.uplink = Uplink(
+            f'{server_url}/api/sensor_data/batch',
+            f'{server_url}/api/laptop_status',
+            spool_path=module.SPOOL_PATH
+        )
+        module.BleakScanner = self._create_scanner
+        module.serial = types.SimpleNamespace(Serial=self._open_serial, SerialException=SerialException)
+        if not verbose:
+            module.print = _quiet
+
+        update_stolen_status = module.uplink.update_stolen_status
+
+        def record_alarm(laptop_serial, is_stolen):
+            if is_stolen:
+                self.alarms.setdefault(laptop_serial, time.time())
+            update_stolen_status(laptop_serial, is_stolen)
+
+        module.uplink.update_stolen_status = record_alarm
+        self.module = module
+
+    def _create_scanner(self, detection_callback=None, **kwargs):
+        self.scanner = FakeBleakScanner(detection_callback, **kwargs)
+        return self.scanner
+
+    def _open_serial(self, port=None, baudrate=9600, timeout=None):
+        self.serial = FakeSerial(port, baudrate, timeout)
+        return self.serial
+
+    def run(self):
+        """The script's main coroutine."""
+        return self.module.scan_and_send_data()
+
+    def spooled(self):
+        """Records waiting in the gateway's spool."""
+        return self.module.uplink.spool.count()
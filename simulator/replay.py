@@ -0,0 +1,80 @@
+"""Feeds trace events to the virtual gateways in real time."""
+import asyncio
+import time
+from simulator.fakes import APPLE_COMPANY_ID, FakeAdvertisementData, FakeDevice, ibeacon_frame
+from simulator.server import SIMULATOR_UUID
+from simulator.traces import ADVERTISEMENT, DISTANCES, THEFT
+
+
+class Replay:
+    """
+    Dispatches events when their time comes: advertisements to the gateway's
+    scanner, distance lines to its serial port. Events for a gateway whose
+    scanner or port isn't open yet are dropped, like the radio would.
+
+    If the simulator itself can't keep up, events are dispatched late; the
+    lag is reported so such runs can be recognised.
+    """
+
+    def __init__(self, gateways, fleet, speed=1.0):
+        self.gateways = gateways
+        self.speed = speed
+        self.thefts = {}
+        self.dispatched = 0
+        self.dropped = 0
+        self.lags = []
+        # Every beacon's advertisement payload, built once
+        self._manufacturer_data = {
+            laptop.mac_address: {APPLE_COMPANY_ID: ibeacon_frame(SIMULATOR_UUID, index >> 16, index & 0xffff)}
+            for index, laptop in enumerate(fleet)
+        }
+        self._devices = {laptop.mac_address: FakeDevice(laptop.mac_address) for laptop in fleet}
+
+    def _dispatch(self, event):
+        gateway = self.gateways.get(event.gateway)
+        if event.kind == THEFT:
+            self.thefts[event.data[0]] = (time.time(), event.data[1])
+            return
+        if gateway is None:
+            self.dropped += 1
+        elif event.kind == ADVERTISEMENT:
+            if gateway.scanner is None or not gateway.scanner.scanning:
+                self.dropped += 1
+                return
+            mac_address, rssi = event.data
+            gateway.scanner.advertise(
+                self._devices[mac_address], FakeAdvertisementData(rssi, self._manufacturer_data[mac_address])
+            )
+        elif event.kind == DISTANCES:
+            if gateway.serial is None:
+                self.dropped += 1
+                return
+            gateway.serial.write_line(event.data)
+        self.dispatched += 1
+
+    async def wait_until_scanning(self, timeout=60.0):
+        """Waits until every gateway has started its scanner, so the trace isn't replayed into booting gateways."""
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + timeout
+        while loop.time() < deadline:
+            if all(gateway.scanner is not None and gateway.scanner.scanning for gateway in self.gateways.values()):
+                return True
+            await asyncio.sleep(0.05)
+        return False
+
+    async def run(self, events, duration):
+        """Replays events until they run out or duration seconds (of trace time) have passed."""
+        loop = asyncio.get_running_loop()
+        started = loop.time()
+        for event in events:
+            if event.t >= duration:
+                break
+            delay = started + event.t / self.speed - loop.time()
+            if delay > 0:
+                await asyncio.sleep(delay)
+            else:
+                self.lags.append(-delay)
+            self._dispatch(event)
+        remaining = started + duration / self.speed - loop.time()
+        if remaining > 0:
+            await asyncio.sleep(remaining)
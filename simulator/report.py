@@ -0,0 +1,76 @@
+"""Summarises a simulation run."""
+
+
+def percentile(values, fraction):
+    """Nearest-rank percentile of values; None if there are none."""
+    if not values:
+        return None
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, max(0, round(fraction * len(ordered)) - 1))]
+
+
+def summarize(values):
+    return {
+        'count': len(values),
+        'p50': percentile(values, 0.50),
+        'p99': percentile(values, 0.99),
+        'max': max(values) if values else None,
+    }
+
+
+def alarm_latencies(thefts, alarm_times):
+    """Seconds from each theft to its alarm, and the thefts that never raised one."""
+    latencies = {'beacon': [], 'moved': []}
+    missed = []
+    for key, (stolen_at, method) in thefts.items():
+        alarm_at = alarm_times.get(key)
+        if alarm_at is None:
+            missed.append(key)
+        else:
+            latencies[method].append(max(0.0, alarm_at - stolen_at))
+    return latencies, missed
+
+
+def _ms(seconds):
+    return '-' if seconds is None else f'{seconds * 1000:.1f}'
+
+
+def _s(seconds):
+    return '-' if seconds is None else f'{seconds:.2f}'
+
+
+def format_report(result):
+    lines = [
+        f"Simulated {result['gateways']} gateways and {result['laptops']} laptops for {result['duration']:.0f}s "
+        f"({result['script']}, {result['database']}).",
+        '',
+        f"Ingest: {result['readings_stored']} readings stored, {result['ingest_rate']:.1f} readings/s; "
+        f"{result['spooled']} records still spooled on the gateways.",
+        '',
+        'Server handler latency (ms):',
+        f"  {'endpoint':<48} {'requests':>9} {'errors':>7} {'p50':>8} {'p99':>8} {'max':>8}",
+    ]
+    for endpoint, stats in sorted(result['endpoints'].items()):
+        lines.append(
+            f"  {endpoint:<48} {stats['count']:>9} {stats['errors']:>7} "
+            f"{_ms(stats['p50']):>8} {_ms(stats['p99']):>8} {_ms(stats['max']):>8}"
+        )
+    for name, stats in result['clients'].items():
+        lines.append(f"  {name} clients: {stats['sent']} requests, {stats['failed']} failed")
+
+    lines += ['', 'Alarm latency (s) from theft to:', f"  {'':<24} {'thefts':>7} {'p50':>7} {'p99':>7} {'max':>7}"]
+    for stage, by_method in result['alarms'].items():
+        for method, stats in by_method['latency'].items():
+            lines.append(
+                f"  {stage + ' (' + method + ')':<24} {stats['count']:>7} "
+                f"{_s(stats['p50']):>7} {_s(stats['p99']):>7} {_s(stats['max']):>7}"
+            )
+        if by_method['missed']:
+            lines.append(f"  {stage}: no alarm for {len(by_method['missed'])} theft(s)")
+
+    replay = result['replay']
+    lines += ['', f"Replay: {replay['dispatched']} events, {replay['dropped']} dropped, "
+                  f"lag p99 {replay['lag_p99'] * 1000:.0f} ms, max {replay['lag_max'] * 1000:.0f} ms."]
+    if replay['lag_p99'] > 0.1:
+        lines.append('  The simulator fell behind the trace; use fewer gateways or laptops per process for accurate numbers.')
+    return '\n'.join(lines)
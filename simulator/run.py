@@ -0,0 +1,108 @@
+"""Runs a complete simulation: server, virtual gateways, clients and the trace replay."""
+import asyncio
+import os
+import socket
+from simulator import clients
+from simulator.gateways import VirtualGateway
+from simulator.replay import Replay
+from simulator.report import alarm_latencies, percentile, summarize
+from simulator.server import ServerProcess, count_readings, seed_database
+
+REPOSITORY_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def _free_port():
+    with socket.socket() as s:
+        s.bind(('127.0.0.1', 0))
+        return s.getsockname()[1]
+
+
+def _silence_gateway_helpers():
+    import gateway.assignment
+    import gateway.serial_reader
+    import gateway.uplink
+    for module in (gateway.assignment, gateway.serial_reader, gateway.uplink):
+        module.print = lambda *args, **kwargs: None
+
+
+async def _run_gateways(gateways, replay, events, duration):
+    tasks = [asyncio.create_task(gateway.run()) for gateway in gateways.values()]
+    try:
+        if not await replay.wait_until_scanning():
+            print('Not every gateway started its scanner; replaying anyway.')
+        await replay.run(events, duration)
+        # Before the tasks are cancelled, which closes the spools
+        return sum(gateway.spooled() for gateway in gateways.values())
+    finally:
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+
+
+def simulate(fleet, events, duration, workdir, database_url, script='pi_script_new', reset=False,
+             report_interval=None, speed=1.0, posters=0, post_rate=0.0, pollers=0, poll_rate=0.0,
+             port=None, verbose=False):
+    """Runs the simulation and returns the result dict format_report() prints."""
+    script_path = script if script.endswith('.py') else os.path.join(REPOSITORY_ROOT, f'{script}.py')
+    laptop_ids = seed_database(fleet, reset=reset)
+    if not verbose:
+        _silence_gateway_helpers()
+
+    server = ServerProcess(port=port or _free_port())
+    server.start()
+    gateways = {}
+    pools = []
+    server_stats = None
+    try:
+        for name in sorted({laptop.gateway for laptop in fleet}):
+            gateways[name] = VirtualGateway(name, script_path, server.url, workdir, report_interval, verbose)
+        if posters and post_rate:
+            pools.append(clients.reading_posters(server.url, list(laptop_ids), posters, post_rate))
+        if pollers and poll_rate:
+            pools.append(clients.status_pollers(server.url, list(laptop_ids.values()), pollers, poll_rate))
+        for pool in pools:
+            pool.start()
+
+        readings_before = count_readings()
+        replay = Replay(gateways, fleet, speed)
+        spooled = asyncio.run(_run_gateways(gateways, replay, events, duration))
+        readings_stored = count_readings() - readings_before
+    finally:
+        for pool in pools:
+            pool.stop()
+        server_stats = server.stop()
+
+    endpoints = {}
+    for endpoint, timings in server_stats['timings'].items():
+        endpoints[endpoint] = dict(summarize(timings), errors=server_stats['errors'].get(endpoint, 0))
+
+    gateway_alarms = {}
+    for gateway in gateways.values():
+        gateway_alarms.update(gateway.alarms)
+    serial_numbers = {laptop_id: serial_number for serial_number, laptop_id in laptop_ids.items()}
+    server_alarms = {serial_numbers[laptop_id]: t for laptop_id, t in server_stats['first_stolen'].items() if laptop_id in serial_numbers}
+    alarms = {}
+    for stage, alarm_times in (('gateway', gateway_alarms), ('server', server_alarms)):
+        latencies, missed = alarm_latencies(replay.thefts, alarm_times)
+        alarms[stage] = {'latency': {method: summarize(values) for method, values in latencies.items()}, 'missed': missed}
+
+    elapsed = duration / speed
+    return {
+        'script': os.path.basename(script_path),
+        'database': database_url.split(':', 1)[0],
+        'gateways': len(gateways),
+        'laptops': len(fleet),
+        'duration': elapsed,
+        'readings_stored': readings_stored,
+        'ingest_rate': readings_stored / elapsed,
+        'spooled': spooled,
+        'endpoints': endpoints,
+        'clients': {pool.name: {'sent': pool.sent, 'failed': pool.failed} for pool in pools},
+        'alarms': alarms,
+        'replay': {
+            'dispatched': replay.dispatched,
+            'dropped': replay.dropped,
+            'lag_p99': percentile(replay.lags, 0.99) or 0.0,
+            'lag_max': max(replay.lags, default=0.0),
+        },
+    }
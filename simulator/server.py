@@ -0,0 +1,137 @@
+"""
+Runs the Flask app for a simulation: seeds the database with the fleet and
+serves the app from a werkzeug server in a separate process, so the virtual
+gateways don't compete with it for the GIL.
+"""
+import logging
+import multiprocessing
+import threading
+import time
+from collections import defaultdict
+
+SIMULATOR_USERNAME = 'simulator'
+SIMULATOR_UUID = 'e2c56db5dffb48d2b060d0f5a71096e0'
+
+
+def seed_database(fleet, reset=False):
+    """
+    Creates the simulator's user, gateways and laptops. Returns
+    {serial_number: laptop_id}. Refuses to touch a database that already has
+    a simulator user unless reset is set, which drops and recreates every
+    table.
+    """
+    from app import app, db
+    from app.models import User, Gateway, Laptop
+
+    with app.app_context():
+        if reset:
+            db.drop_all()
+        db.create_all()
+        if User.query.filter_by(username=SIMULATOR_USERNAME).first() is not None:
+            raise RuntimeError('The database already holds a simulation. Use an empty database or pass --reset.')
+
+        user = User(username=SIMULATOR_USERNAME, email='simulator@example.com')
+        user.set_password(SIMULATOR_USERNAME)
+        db.session.add(user)
+        gateways = {name: Gateway(name=name, assignment_version=1) for name in sorted({laptop.gateway for laptop in fleet})}
+        db.session.add_all(gateways.values())
+        db.session.flush()
+
+        db.session.execute(db.insert(Laptop), [{
+            'name': f'Simulated {laptop.serial_number}',
+            'serial_number': laptop.serial_number,
+            'user_id': user.id,
+            'gateway_id': gateways[laptop.gateway].id,
+            'ibeacon_uuid': SIMULATOR_UUID,
+            'ibeacon_major': index >> 16,
+            'ibeacon_minor': index & 0xffff,
+            'ibeacon_mac_address': laptop.mac_address,
+            'ultrasonic_sensor_index': laptop.sensor_index,
+            'is_stolen': False,
+        } for index, laptop in enumerate(fleet)])
+        db.session.commit()
+        return dict(db.session.query(Laptop.serial_number, Laptop.id).filter(Laptop.user_id == user.id).all())
+
+
+def count_readings():
+    from app import app, db
+    from app.models import SensorReading
+
+    with app.app_context():
+        return db.session.query(db.func.count(SensorReading.id)).scalar()
+
+
+def _serve(host, port, conn):
+    """Entry point of the server process. Reports the collected stats when told to stop."""
+    from flask import g, request
+    from werkzeug.serving import make_server
+    from app import app
+    from app.status_stream import status_broker
+
+    logging.getLogger('werkzeug').setLevel(logging.WARNING)
+    timings = defaultdict(list)
+    errors = defaultdict(int)
+    first_stolen = {}
+
+    @app.before_request
+    def start_timer():
+        g.simulator_started = time.perf_counter()
+
+    @app.after_request
+    def record_timing(response):
+        endpoint = f'{request.method} {request.url_rule.rule if request.url_rule else request.path}'
+        timings[endpoint].append(time.perf_counter() - g.simulator_started)
+        if response.status_code >= 400:
+            errors[endpoint] += 1
+        return response
+
+    publish = status_broker.publish
+
+    def record_alarm(user_id, laptop_id, **fields):
+        if fields.get('is_stolen'):
+            first_stolen.setdefault(laptop_id, time.time())
+        return publish(user_id, laptop_id, **fields)
+
+    status_broker.publish = record_alarm
+
+    server = make_server(host, port, app, threaded=True)
+    threading.Thread(target=server.serve_forever, name='simulator-server', daemon=True).start()
+    conn.send('ready')
+    conn.recv()
+    server.shutdown()
+    conn.send({'timings': dict(timings), 'errors': dict(errors), 'first_stolen': first_stolen})
+
+
+class ServerProcess:
+    """The Flask app served on host:port by a child process."""
+
+    def __init__(self, host='127.0.0.1', port=5055):
+        self.host = host
+        self.port = port
+        self._conn = None
+        self._process = None
+
+    @property
+    def url(self):
+        return f'http://{self.host}:{self.port}'
+
+    def start(self, timeout=60):
+        # A fresh interpreter, so the child shares neither the GIL nor the
+        # parent's database connections
+        context = multiprocessing.get_context('spawn')
+        self._conn, child_conn = context.Pipe()
+        self._process = context.Process(target=_serve, args=(self.host, self.port, child_conn), daemon=True)
+        self._process.start()
+        try:
+            ready = self._conn.poll(timeout) and self._conn.recv() == 'ready'
+        except EOFError:
+            ready = False
+        if not ready:
+            raise RuntimeError('The simulated server did not start.')
+
+    def stop(self, timeout=60):
+        """Stops the server and returns its stats: timings per endpoint, error counts and alarm times."""
+        self._conn.send('stop')
+        stats = self._conn.recv() if self._conn.poll(timeout) else None
+        self._process.join(timeout)
+        return stats
@@ -0,0 +1,149 @@
+"""
+Traces of what the gateways' radios and serial ports receive.
+
+A trace is a fleet (the virtual laptops and the gateway each one is
+assigned to) and a time-ordered stream of events:
+
+- advertisement: (mac_address, rssi), a beacon advertisement heard by a gateway
+- distances: [d1, d2, d3, d4], a line from a gateway's Arduino
+- theft: (serial_number, method), a marker for when a laptop was taken;
+  method is 'beacon' (it left the range) or 'moved' (its sensor reads out
+  of range). The other events already reflect the theft.
+
+Traces are stored as JSON lines (gzip-compressed if the file name ends in
+.gz): the fleet first, then one [t, kind, gateway, data] array per event.
+"""
+import gzip
+import heapq
+import json
+import random
+from collections import namedtuple
+from operator import attrgetter
+
+ADVERTISEMENT = 'advertisement'
+DISTANCES = 'distances'
+THEFT = 'theft'
+
+VirtualLaptop = namedtuple('VirtualLaptop', ['serial_number', 'mac_address', 'gateway', 'sensor_index'])
+Event = namedtuple('Event', ['t', 'kind', 'gateway', 'data'])
+
+
+def synthetic_fleet(gateways, laptops_per_gateway, sensors_per_gateway=4):
+    """The first sensors_per_gateway laptops of each gateway get an ultrasonic sensor."""
+    fleet = []
+    for g in range(gateways):
+        name = f'sim-gw-{g + 1:03d}'
+        for i in range(laptops_per_gateway):
+            fleet.append(VirtualLaptop(
+                serial_number=f'SIM-{g + 1:03d}-{i + 1:05d}',
+                mac_address=f'5A:{g >> 8:02X}:{g & 0xff:02X}:{i >> 16 & 0xff:02X}:{i >> 8 & 0xff:02X}:{i & 0xff:02X}',
+                gateway=name,
+                sensor_index=i if i < sensors_per_gateway else None
+            ))
+    return fleet
+
+
+def schedule_thefts(fleet, count, start, end, seed=0):
+    """
+    Picks count laptops and a theft time for each. Half of the thefts (as
+    far as there are laptops with a sensor) move the laptop, the others take
+    its beacon out of range. Returns {serial_number: (t, method)}.
+    """
+    rng = random.Random(f'{seed}:thefts')
+    with_sensor = [laptop for laptop in fleet if laptop.sensor_index is not None]
+    moved = rng.sample(with_sensor, min(count // 2, len(with_sensor)))
+    moved_serials = {laptop.serial_number for laptop in moved}
+    others = [laptop for laptop in fleet if laptop.serial_number not in moved_serials]
+    taken = rng.sample(others, min(count - len(moved), len(others)))
+    thefts = {laptop.serial_number: (rng.uniform(start, end), 'moved') for laptop in moved}
+    thefts.update((laptop.serial_number, (rng.uniform(start, end), 'beacon')) for laptop in taken)
+    return thefts
+
+
+def _advertisements(laptop, duration, interval, loss, theft, seed):
+    rng = random.Random(f'{seed}:{laptop.mac_address}')
+    mean_rssi = rng.uniform(-75, -55)
+    stop = duration
+    if theft is not None and theft[1] == 'beacon':
+        stop = theft[0]
+    # Beacons add a random delay of up to 10 ms to every advertising interval
+    t = rng.uniform(0, interval)
+    while t < stop:
+        if rng.random() >= loss:
+            yield Event(t, ADVERTISEMENT, laptop.gateway, (laptop.mac_address, round(rng.gauss(mean_rssi, 3))))
+        t += interval + rng.uniform(0, 0.01)
+
+
+def _distances(gateway, sensors, duration, interval, thefts, seed):
+    rng = random.Random(f'{seed}:{gateway}')
+    baselines = [rng.uniform(15, 40) for _ in range(len(sensors))]
+    moved_at = [thefts[laptop.serial_number][0] if laptop is not None and thefts.get(laptop.serial_number, (0, None))[1] == 'moved' else None
+                for laptop in sensors]
+    t = rng.uniform(0, interval)
+    while t < duration:
+        yield Event(t, DISTANCES, gateway, [
+            round(rng.uniform(250, 400) if moved is not None and t >= moved else max(0.0, rng.gauss(baseline, 0.5)), 1)
+            for baseline, moved in zip(baselines, moved_at)
+        ])
+        t += interval
+
+
+def synthetic_trace(fleet, duration, thefts=None, advertising_interval=1.0, serial_interval=0.1,
+                    loss=0.05, sensors_per_gateway=4, seed=0):
+    """
+    Generates the events of a fleet lazily, in time order. Every beacon
+    advertises every advertising_interval seconds and loses a fraction of
+    its advertisements; every gateway's Arduino sends a line every
+    serial_interval seconds.
+    """
+    thefts = thefts or {}
+    streams = []
+    sensors = {}
+    for laptop in fleet:
+        streams.append(_advertisements(
+            laptop, duration, advertising_interval, loss, thefts.get(laptop.serial_number), seed
+        ))
+        gateway_sensors = sensors.setdefault(laptop.gateway, [None] * sensors_per_gateway)
+        if laptop.sensor_index is not None and laptop.sensor_index < sensors_per_gateway:
+            gateway_sensors[laptop.sensor_index] = laptop
+    for gateway, gateway_sensors in sensors.items():
+        streams.append(_distances(gateway, gateway_sensors, duration, serial_interval, thefts, seed))
+
+    gateway_of = {laptop.serial_number: laptop.gateway for laptop in fleet}
+    streams.append(sorted(
+        Event(t, THEFT, gateway_of[serial_number], (serial_number, method))
+        for serial_number, (t, method) in thefts.items()
+    ))
+    return heapq.merge(*streams, key=attrgetter('t'))
+
+
+def _open(path, mode):
+    if path.endswith('.gz'):
+        return gzip.open(path, mode + 't', encoding='utf-8')
+    return open(path, mode, encoding='utf-8')
+
+
+def save_trace(path, fleet, events):
+    """Writes a trace. Returns the number of events written."""
+    count = 0
+    with _open(path, 'w') as f:
+        f.write(json.dumps({'fleet': [laptop._asdict() for laptop in fleet]}) + '\n')
+        for event in events:
+            f.write(json.dumps([round(event.t, 4), event.kind, event.gateway, event.data]) + '\n')
+            count += 1
+    return count
+
+
+def load_trace(path):
+    """Returns the fleet of a trace and an iterator over its events, read as they are consumed."""
+    f = _open(path, 'r')
+    header = json.loads(f.readline())
+    fleet = [VirtualLaptop(**laptop) for laptop in header['fleet']]
+
+    def events():
+        with f:
+            for line in f:
+                t, kind, gateway, data = json.loads(line)
+                yield Event(t, kind, gateway, tuple(data) if kind != DISTANCES else data)
+
+    return fleet, events()